@@ -2,17 +2,42 @@
 # Imports
 #----------------------------------------------------------------------------#
 
+import bisect
+import csv
+import io
 import json
+import random
+import sys
+import time
+import click
 import dateutil.parser
 import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
+import babel.dates
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from collections import Counter, defaultdict
+from itertools import chain, groupby
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort, jsonify, session, stream_with_context
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
+from database import ManagedSQLAlchemy, ReplicaRouter, db_now, pool_metrics, prometheus_text
 import logging
-from logging import Formatter, FileHandler
+from log_pipeline import QueuedLogging, rotating_file_handler
 from flask_wtf import Form
 from forms import *
 from flask_migrate import Migrate
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from name_index import NameIndex
+from instrumentation import SQLInstrumentation
+from page_cache import PageCache, LRUBackend
+from facets import FacetIndex
+from recommend import Matcher
+from http_cache import conditional
+import reference_data
+import importer
+import schedule
+import seed_data
+import benchmark
 #from flask_wtf.csrf import CSRFProtect
 #----------------------------------------------------------------------------#
 # App Config.
@@ -22,8 +47,13 @@ app = Flask(__name__)
 moment = Moment(app)
 #csrf = CSRFProtect()
 app.config.from_object('config')
-db = SQLAlchemy(app)
+db = ManagedSQLAlchemy(app)
+# listing, detail, search, /shows and calendar views read from a replica;
+# autocomplete, browse and recommendations build long-lived in-memory indexes
+# and stay on the primary so a lagging replica cannot leave them stale
+replicas = ReplicaRouter(app, db)
 migrate = Migrate(app, db)
+sql_instrumentation = SQLInstrumentation(app)
 #csrf.init_app(app)
 
 # TODO: connect to a local postgresql database
@@ -34,11 +64,13 @@ migrate = Migrate(app, db)
 
 venueGenres = db.Table('venueGenres',
     db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True),
-    db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id'), primary_key=True)
+    db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id'), primary_key=True),
+    db.Index('ix_venueGenres_venue_id_genre_id', 'venue_id', 'genre_id')
 )
 artistGenres = db.Table('artistGenres',
     db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id'), primary_key=True),
-    db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id'), primary_key=True)
+    db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id'), primary_key=True),
+    db.Index('ix_artistGenres_artist_id_genre_id', 'artist_id', 'genre_id')
 )
 class Genre(db.Model):
     __tablename__ = 'Genre'
@@ -53,6 +85,12 @@ class State(db.Model):
 
 class Venue(db.Model):
     __tablename__ = 'Venue'
+    __table_args__ = (
+      db.Index('ix_Venue_name_trgm', 'name', postgresql_using='gin',
+        postgresql_ops={'name': 'gin_trgm_ops'}),
+      db.Index('ix_Venue_state_city', 'state', 'city'),
+      db.Index('ix_Venue_updated_at', 'updated_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
@@ -65,6 +103,11 @@ class Venue(db.Model):
     website = db.Column(db.String(120))
     seeking_talent = db.Column(db.Boolean())
     seeking_description = db.Column(db.String(500))
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime, nullable=False, default=db_now(),
+      onupdate=db_now(), server_default=db.func.now())
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    archived_at = db.Column(db.DateTime)
     shows = db.relationship('Show', backref='Venue', lazy=True)
     genres = db.relationship('Genre', secondary=venueGenres,
       backref=db.backref('Venue', lazy=True))
@@ -74,6 +117,12 @@ class Venue(db.Model):
 
 class Artist(db.Model):
     __tablename__ = 'Artist'
+    __table_args__ = (
+      db.Index('ix_Artist_name_trgm', 'name', postgresql_using='gin',
+        postgresql_ops={'name': 'gin_trgm_ops'}),
+      db.Index('ix_Artist_state', 'state'),
+      db.Index('ix_Artist_updated_at', 'updated_at'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
@@ -85,6 +134,10 @@ class Artist(db.Model):
     website = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean())
     seeking_description = db.Column(db.String(500))
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    updated_at = db.Column(db.DateTime, nullable=False, default=db_now(),
+      onupdate=db_now(), server_default=db.func.now())
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
     shows = db.relationship('Show', backref=('Artist'), lazy=True)
     genres = db.relationship('Genre', secondary=artistGenres,
       backref=db.backref('Artist', lazy=True))
@@ -92,106 +145,169 @@ class Artist(db.Model):
     # TODO: implement any missing fields, as a database migration using Flask-Migrate
 class Show(db.Model):
   __tablename__ = 'Show'
+  __table_args__ = (
+    db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+    db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+    db.Index('ix_Show_start_time', 'start_time'),
+    db.Index('ix_Show_updated_at', 'updated_at'),
+  )
   id = db.Column(db.Integer, primary_key=True)
-  venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'))
-  artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'))
-  start_time = db.Column(db.DateTime())
+  # active_history loads the old value before a change even when the show
+  # was expired, so count_updated_show can move the counters
+  venue_id = db.column_property(db.Column(db.Integer, db.ForeignKey('Venue.id')), active_history=True)
+  artist_id = db.column_property(db.Column(db.Integer, db.ForeignKey('Artist.id')), active_history=True)
+  start_time = db.column_property(db.Column(db.DateTime()), active_history=True)
+  updated_at = db.Column(db.DateTime, nullable=False, default=db_now(),
+    onupdate=db_now(), server_default=db.func.now())
+
+# Venue.upcoming_shows_count and Artist.upcoming_shows_count are kept in step
+# with Show writes inside the flushing transaction. Shows that slide from
+# upcoming to past are picked up by `flask reconcile-show-counts`, which is
+# meant to run periodically (e.g. from cron).
+
+def adjust_upcoming_counts(connection, model, deltas):
+  # deltas: {owner_id: delta}, applied with one executemany UPDATE
+  deltas = {owner_id: delta for owner_id, delta in deltas.items() if owner_id is not None and delta}
+  if deltas:
+    table = model.__table__
+    connection.execute(
+      table.update().where(table.c.id == db.bindparam('owner_id')).values(
+        upcoming_shows_count=table.c.upcoming_shows_count + db.bindparam('delta')),
+      [{"owner_id": owner_id, "delta": delta} for owner_id, delta in deltas.items()])
+
+def bump_upcoming_counts(connection, shows, delta):
+  # shows: (venue_id, artist_id, start_time) tuples. Deltas are summed per
+  # owner and applied with one executemany UPDATE per table.
+  now = datetime.now()
+  upcoming = [show for show in shows if show[2] is not None and show[2] > now]
+  for model, position in ((Venue, 0), (Artist, 1)):
+    counts = Counter(show[position] for show in upcoming)
+    adjust_upcoming_counts(connection, model, {owner_id: count * delta for owner_id, count in counts.items()})
+
+@event.listens_for(Show, 'after_insert')
+def count_inserted_show(mapper, connection, show):
+  bump_upcoming_counts(connection, [(show.venue_id, show.artist_id, show.start_time)], 1)
+
+@event.listens_for(Show, 'after_delete')
+def count_deleted_show(mapper, connection, show):
+  bump_upcoming_counts(connection, [(show.venue_id, show.artist_id, show.start_time)], -1)
+
+@event.listens_for(Show, 'after_update')
+def count_updated_show(mapper, connection, show):
+  state = db.inspect(show)
+  def previous(attr):
+    history = state.attrs[attr].history
+    return history.deleted[0] if history.deleted else getattr(show, attr)
+  old = (previous('venue_id'), previous('artist_id'), previous('start_time'))
+  new = (show.venue_id, show.artist_id, show.start_time)
+  if old != new:
+    bump_upcoming_counts(connection, [old], -1)
+    bump_upcoming_counts(connection, [new], 1)
+
+def reconcile_upcoming_counts(since=None, now=None):
+  # recompute the counters with one set-based UPDATE per table. With `since`,
+  # only owners of shows that started in (since, now] are touched.
+  now = now or datetime.now()
+  updated = 0
+  for model, owner_column in ((Venue, Show.venue_id), (Artist, Show.artist_id)):
+    actual = db.session.query(db.func.count(Show.id)).filter(
+      owner_column == model.id, Show.start_time > now).scalar_subquery()
+    query = db.session.query(model).filter(model.upcoming_shows_count != actual)
+    if since is not None:
+      query = query.filter(model.id.in_(db.session.query(owner_column).filter(
+        Show.start_time > since, Show.start_time <= now)))
+    updated += query.update({model.upcoming_shows_count: actual}, synchronize_session=False)
+  if updated:
+    note_cache_changes(db.session, ('Venue', 'Artist'))
+  db.session.commit()
+  return updated
+
+def upcoming_count_mismatches(now=None):
+  now = now or datetime.now()
+  mismatches = []
+  for model, owner_column in ((Venue, Show.venue_id), (Artist, Show.artist_id)):
+    actual = db.func.count(Show.id)
+    rows = db.session.query(model.id, model.upcoming_shows_count, actual
+      ).outerjoin(Show, db.and_(owner_column == model.id, Show.start_time > now)
+      ).group_by(model.id, model.upcoming_shows_count
+      ).having(model.upcoming_shows_count != actual).all()
+    mismatches += [(model.__tablename__, entity_id, stored, counted)
+      for entity_id, stored, counted in rows]
+  return mismatches
 
 # TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
 
+# Page cache versions: 'Venue'/'Artist'/'Show' for whole tables and
+# 'Venue:<id>'/'Artist:<id>' for single rows. Changes seen in a flush are
+# bumped once the transaction commits. Core statements that bypass the unit
+# of work (bulk inserts, set-based updates) call note_cache_changes().
+
+page_cache = PageCache(LRUBackend(app.config['PAGE_CACHE_SIZE'], app.config['PAGE_CACHE_TTL']))
+
+def note_cache_changes(session, names):
+  session.info.setdefault('cache_versions', set()).update(names)
+
+@event.listens_for(Session, 'after_flush')
+def track_cache_changes(session, flush_context):
+  names = set()
+  for instance in chain(session.new, session.dirty, session.deleted):
+    if isinstance(instance, (Venue, Artist)):
+      names.update((instance.__tablename__, f'{instance.__tablename__}:{instance.id}'))
+    elif isinstance(instance, Show):
+      names.add('Show')
+      state = db.inspect(instance)
+      for attr, table in (('venue_id', 'Venue'), ('artist_id', 'Artist')):
+        history = state.attrs[attr].history
+        names.update(f'{table}:{owner_id}' for owner_id in chain(*history) if owner_id is not None)
+  if names:
+    note_cache_changes(session, names)
+
+@event.listens_for(Session, 'after_commit')
+def bump_cache_versions(session):
+  page_cache.bump(session.info.pop('cache_versions', ()))
+
+@event.listens_for(Session, 'after_rollback')
+def discard_cache_versions(session):
+  session.info.pop('cache_versions', None)
+
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
-# a list of states and genres and to get their id without sending a request to the db
-genreDict={
-            1:'Alternative' ,
-            2: 'Blues' ,
-            3: 'Classical' ,
-            4: 'Country' ,
-            5: 'Electronic' ,
-            6: 'Folk' ,
-            7: 'Funk' ,
-            8: 'Hip-Hop' ,
-            9: 'Heavy Metal' ,
-            10:'Instrumental' ,
-            11: 'Jazz' ,
-            12: 'Musical Theatre' ,
-            13: 'Pop' ,
-            14: 'Punk' ,
-            15: 'R&B' ,
-            16: 'Reggae' ,
-            17: 'Rock n Roll' ,
-            18: 'Soul' ,
-            19: 'Other' 
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma",
 }
-stateDict= { 1: 'AL' , 
-             2: 'AK' ,
-             3: 'AZ' ,
-             4: 'AR' ,
-             5: 'CA' ,
-             6: 'CO' ,
-             7: 'CT' ,
-             8: 'DE' ,
-             9: 'DC' ,
-             10: 'FL' ,
-             11: 'GA' ,
-             12: 'HI' ,
-             13: 'ID' ,
-             14: 'IL' ,
-             15: 'IN' ,
-             16: 'IA' ,
-             17: 'KS' ,
-             18: 'KY' ,
-             19: 'LA' ,
-             20: 'ME' ,
-             21: 'MT' ,
-             22: 'NE' ,
-             23: 'NV' ,
-             24: 'NH' ,
-             25: 'NJ' ,
-             26: 'NM' ,
-             27: 'NY' ,
-             28: 'NC' ,
-             29: 'ND' ,
-             30: 'OH' ,
-             31: 'OK' ,
-             32: 'OR' ,
-             33: 'MD' ,
-             34: 'MA' ,
-             35: 'MI' ,
-             36: 'MN' ,
-             37: 'MS' ,
-             38: 'MO' ,
-             39: 'PA' ,
-             40: 'RI' ,
-             41: 'SC' ,
-             42: 'SD' ,
-             43: 'TN' ,
-             44: 'TX' ,
-             45: 'UT' ,
-             46: 'VT' ,
-             47: 'VA' ,
-             48: 'WA' ,
-             49: 'WV' ,
-             50: 'WI' ,
-             51: 'WY' ,}
-def getKeys(dictOfElements, values):
-    listOfKeys = list()
-    listOfItems = dictOfElements.items()
-    for item  in listOfItems:
-      for value in values:      
-        if item[1] == value:
-            listOfKeys.append(item[0])    
-    return  listOfKeys
-
-
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format)
+
+# Babel patterns and locales are compiled once per (format, locale); string
+# dates are parsed once and kept in a bounded LRU. Native datetimes skip
+# parsing altogether.
+
+@lru_cache(maxsize=64)
+def datetime_pattern(format, locale):
+  # our named formats, then Babel's (short, long, ...) for the locale, then
+  # `format` as a raw pattern
+  if format in DATETIME_FORMATS:
+    return babel.dates.parse_pattern(DATETIME_FORMATS[format])
+  if format in ('short', 'medium', 'long', 'full'):
+    combined = babel.dates.get_datetime_format(format, locale)
+    return babel.dates.parse_pattern(combined
+      .replace('{0}', babel.dates.get_time_format(format, locale).pattern)
+      .replace('{1}', babel.dates.get_date_format(format, locale).pattern))
+  return babel.dates.parse_pattern(format)
+
+@lru_cache(maxsize=16)
+def babel_locale(locale):
+  return babel.Locale.parse(locale)
+
+@lru_cache(maxsize=4096)
+def parse_datetime(value):
+  return dateutil.parser.parse(value)
+
+def format_datetime(value, format='medium', locale=babel.dates.LC_TIME):
+  if not isinstance(value, datetime):
+    value = parse_datetime(value)
+  locale = babel_locale(locale)
+  return datetime_pattern(format, locale).apply(value, locale)
 
 app.jinja_env.filters['datetime'] = format_datetime
 
@@ -199,139 +315,631 @@ app.jinja_env.filters['datetime'] = format_datetime
 # Controllers.
 #----------------------------------------------------------------------------#
 
+@app.before_request
+def load_reference_data():
+  # genres and states are read once per process; forms and controllers then
+  # resolve names and ids from reference_data without touching the db
+  if not reference_data.loaded:
+    reference_data.load(db.session.query(Genre.id, Genre.name),
+      db.session.query(State.id, State.name))
+
 @app.route('/')
 def index():
   return render_template('pages/home.html')
 
 
+#  Show history
+#  ----------------------------------------------------------------
+
+def encode_show_cursor(start_time, show_id):
+  return f'{start_time.isoformat()}_{show_id}'
+
+def decode_show_cursor(cursor):
+  try:
+    start_time, show_id = cursor.rsplit('_', 1)
+    return datetime.fromisoformat(start_time), int(show_id)
+  except (AttributeError, ValueError):
+    abort(400)
+
+def show_counts(owner_column, owner_id, now):
+  # (past, upcoming) counts for one venue or artist in a single GROUP BY
+  upcoming = Show.start_time > now
+  counts = dict(db.session.query(upcoming, db.func.count(Show.id)
+    ).filter(owner_column == owner_id, Show.start_time != None
+    ).group_by(upcoming).all())
+  return counts.get(False, 0), counts.get(True, 0)
+
+def show_history(owner_column, owner_id, counterpart, prefix, now, before=None):
+  # upcoming shows are limited to UPCOMING_SHOWS_WINDOW_DAYS and capped at
+  # UPCOMING_SHOWS_LIMIT; past shows are keyset paginated newest first on
+  # (start_time, id) so each page costs the same however long the history is.
+  page_size = app.config['PAST_SHOWS_PAGE_SIZE']
+  window_end = now + timedelta(days=app.config['UPCOMING_SHOWS_WINDOW_DAYS'])
+  columns = (Show.id, Show.start_time, counterpart.id, counterpart.name, counterpart.image_link)
+  related = getattr(Show, prefix + '_id') == counterpart.id
+
+  upcoming = db.session.query(*columns).join(counterpart, related
+    ).filter(owner_column == owner_id, Show.start_time > now, Show.start_time <= window_end
+    ).order_by(Show.start_time, Show.id
+    ).limit(app.config['UPCOMING_SHOWS_LIMIT']).all()
+
+  past = db.session.query(*columns).join(counterpart, related
+    ).filter(owner_column == owner_id, Show.start_time <= now)
+  if before is not None:
+    start_time, show_id = before
+    past = past.filter(db.or_(Show.start_time < start_time,
+      db.and_(Show.start_time == start_time, Show.id < show_id)))
+  past = past.order_by(Show.start_time.desc(), Show.id.desc()).limit(page_size + 1).all()
+
+  next_cursor = None
+  if len(past) > page_size:
+    past = past[:page_size]
+    next_cursor = encode_show_cursor(past[-1][1], past[-1][0])
+
+  def serialize(rows):
+    return [{
+      prefix + "_id": related_id,
+      prefix + "_name": name,
+      prefix + "_image_link": image_link,
+      "start_time": start_time,
+    } for _, start_time, related_id, name, image_link in rows]
+
+  return serialize(past), serialize(upcoming), next_cursor
+
+#  Search
+#  ----------------------------------------------------------------
+
+def escape_like(term):
+  return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def search_by_name(model, term):
+  # case-insensitive partial match on name. On PostgreSQL the ILIKE is served by
+  # the pg_trgm GIN index and results are ranked by trigram similarity; other
+  # databases (SQLite in tests) rank by match position and name length.
+  # num_upcoming_shows and the total match count come back in the same query.
+  term = term.strip()
+  matches = model.name.ilike(f'%{escape_like(term)}%', escape='\\')
+  if model is Venue:
+    matches = db.and_(matches, Venue.archived_at == None)
+  if db.engine.dialect.name == 'postgresql':
+    rank = (db.func.similarity(model.name, term).desc(),)
+  else:
+    rank = (db.func.instr(db.func.lower(model.name), term.lower()), db.func.length(model.name))
+  rows = db.session.query(
+      model.id, model.name, model.upcoming_shows_count, db.func.count().over()
+    ).filter(matches
+    ).order_by(*rank, model.name, model.id
+    ).limit(app.config['SEARCH_RESULTS_LIMIT']).all()
+  return {
+    "count": rows[0][3] if rows else 0,
+    "data": [{
+      "id": entity_id,
+      "name": name,
+      "num_upcoming_shows": num_upcoming_shows,
+    } for entity_id, name, num_upcoming_shows, _ in rows]
+  }
+
+#  Index sync
+#  ----------------------------------------------------------------
+# In-memory indexes see the writes committed in their own process right
+# away; writes from other workers are picked up by IndexSync. At most every
+# INDEX_SYNC_SECONDS it reads count, max(id) and max(updated_at) of Venue and
+# Artist (index-only aggregates). When those moved, the rows updated since
+# the previous check, less INDEX_SYNC_MARGIN_SECONDS for clock skew and late
+# commits, are re-read by id. A count those rows do not explain means a
+# delete, and the index is rebuilt, as it is for very large change sets.
+
+SYNC_SOURCES = (('venue', Venue), ('artist', Artist))
+
+def owner_versions():
+  columns = [db.session.query(aggregate).scalar_subquery() for _, model in SYNC_SOURCES
+    for aggregate in (db.func.count(model.id), db.func.max(model.id), db.func.max(model.updated_at))]
+  row = tuple(db.session.query(*columns).one())
+  return {kind: row[3 * i:3 * i + 3] for i, (kind, _) in enumerate(SYNC_SOURCES)}
+
+class IndexSync(object):
+
+  def __init__(self, build, refresh, max_refresh=1000):
+    # build(): load the whole index; refresh(kind, ids): re-read those ids
+    self.build = build
+    self.refresh = refresh
+    self.max_refresh = max_refresh
+    self.seen = None
+    self.checked = 0
+
+  def load(self):
+    versions = owner_versions()
+    self.build()
+    self.seen, self.checked = versions, time.monotonic()
+
+  def changed_ids(self, versions):
+    # {kind: ids} to refresh, or None when only a rebuild will do
+    margin = timedelta(seconds=app.config['INDEX_SYNC_MARGIN_SECONDS'])
+    changed = {}
+    for kind, model in SYNC_SOURCES:
+      count, max_id, _ = versions[kind]
+      seen_count, seen_max_id, seen_updated = self.seen[kind]
+      if versions[kind] == self.seen[kind]:
+        continue
+      query = db.session.query(model.id)
+      if seen_updated is not None:
+        query = query.filter(model.updated_at > seen_updated - margin)
+      ids = [entity_id for entity_id, in query.limit(self.max_refresh + 1)]
+      new = sum(1 for entity_id in ids if entity_id > (seen_max_id or 0))
+      if len(ids) > self.max_refresh or count != seen_count + new:
+        return None
+      changed[kind] = ids
+    return changed
+
+  def sync(self):
+    if self.seen is None:
+      self.load()
+      return
+    now = time.monotonic()
+    if now - self.checked < app.config['INDEX_SYNC_SECONDS']:
+      return
+    self.checked = now
+    versions = owner_versions()
+    if versions == self.seen:
+      return
+    changed = self.changed_ids(versions)
+    if changed is None:
+      self.load()
+      return
+    for kind, ids in changed.items():
+      if ids:
+        self.refresh(kind, ids)
+    self.seen = versions
+
+#  Autocomplete
+#  ----------------------------------------------------------------
+# names are served from memory; the index is loaded on first use, kept in
+# step with Venue/Artist writes once their transaction commits and synced
+# with other workers' writes through IndexSync.
+
+name_index = NameIndex(app.config['AUTOCOMPLETE_MAX_ENTRIES'])
+
+def refresh_name_index(kind, ids):
+  model = dict(SYNC_SOURCES)[kind]
+  query = db.session.query(model.id, model.name).filter(model.id.in_(ids))
+  if model is Venue:
+    query = query.filter(Venue.archived_at == None)
+  names = dict(query)
+  for entity_id in ids:
+    if entity_id in names:
+      name_index.add(kind, entity_id, names[entity_id])
+    else:
+      name_index.remove(kind, entity_id)
+
+def load_name_index():
+  venues = db.session.query(Venue.id, Venue.name).filter(Venue.archived_at == None).yield_per(5000)
+  artists = db.session.query(Artist.id, Artist.name).yield_per(5000)
+  name_index.build([('venue', venue_id, name) for venue_id, name in venues] +
+    [('artist', artist_id, name) for artist_id, name in artists])
+
+def note_name_change(session, action, kind, entity_id, name=None):
+  session.info.setdefault('name_index', []).append((action, kind, entity_id, name))
+
+def track_name_change(action):
+  def listener(mapper, connection, target):
+    session = Session.object_session(target)
+    if session is not None:
+      # an archived venue stays out of the index whatever else changes
+      archived = getattr(target, 'archived_at', None) is not None
+      note_name_change(session, 'remove' if archived else action, mapper.class_.__tablename__.lower(),
+        target.id, target.name)
+  return listener
+
+for model in (Venue, Artist):
+  event.listen(model, 'after_insert', track_name_change('add'))
+  event.listen(model, 'after_update', track_name_change('add'))
+  event.listen(model, 'after_delete', track_name_change('remove'))
+
+@event.listens_for(Session, 'after_commit')
+def apply_name_changes(session):
+  changes = session.info.pop('name_index', [])
+  if not name_index.loaded:
+    return
+  for action, kind, entity_id, name in changes:
+    if action == 'add':
+      name_index.add(kind, entity_id, name)
+    else:
+      name_index.remove(kind, entity_id)
+
+@event.listens_for(Session, 'after_rollback')
+def discard_name_changes(session):
+  session.info.pop('name_index', None)
+
+name_sync = IndexSync(load_name_index, refresh_name_index)
+
+@app.route('/autocomplete')
+def autocomplete():
+  name_sync.sync()
+  kind = request.args.get('type')
+  if kind not in (None, 'venue', 'artist'):
+    abort(400)
+  limit = min(request.args.get('limit', app.config['AUTOCOMPLETE_LIMIT'], type=int),
+    app.config['AUTOCOMPLETE_LIMIT'])
+  return jsonify({"data": name_index.search(request.args.get('q', ''), limit, kind)})
+
+#  Facets
+#  ----------------------------------------------------------------
+# Browsing by genre/state/seeking flag is answered from the bitmap index in
+# facets.py. It is built on first use; committed writes, and those IndexSync
+# finds from other workers, mark the touched venues and artists stale and
+# they are re-read, by id, before the next browse request.
+
+facet_index = FacetIndex()
+FACET_SOURCES = {
+  'artist': (Artist, 'seeking_venue', artistGenres, 'artist_id'),
+  'venue': (Venue, 'seeking_talent', venueGenres, 'venue_id'),
+}
+
+def facet_rows(kind, ids=None):
+  model, seeking, genre_table, owner_key = FACET_SOURCES[kind]
+  owner_column = genre_table.c[owner_key]
+  rows = db.session.query(model.id, model.state, getattr(model, seeking))
+  links = db.session.query(owner_column, genre_table.c.genre_id)
+  if model is Venue:
+    rows = rows.filter(Venue.archived_at == None)
+  if ids is not None:
+    rows, links = rows.filter(model.id.in_(ids)), links.filter(owner_column.in_(ids))
+  genres = defaultdict(list)
+  for owner_id, genre_id in links.yield_per(5000):
+    genres[owner_id].append(genre_id)
+  return [(entity_id, state, seeking, genres[entity_id]) for entity_id, state, seeking in rows.yield_per(5000)]
+
+def load_facet_index():
+  facet_index.build((kind,) + row for kind in FACET_SOURCES for row in facet_rows(kind))
+
+def refresh_facet_index(chunk_size=500):
+  stale = defaultdict(list)
+  for kind, entity_id in facet_index.take_stale():
+    stale[kind].append(entity_id)
+  for kind, ids in stale.items():
+    for offset in range(0, len(ids), chunk_size):
+      chunk = ids[offset:offset + chunk_size]
+      rows = facet_rows(kind, chunk)
+      facet_index.refresh(kind, rows, set(chunk) - {row[0] for row in rows})
+
+def note_facet_changes(session, pairs):
+  session.info.setdefault('facets', set()).update(pairs)
+
+@event.listens_for(Session, 'after_flush')
+def track_facet_changes(session, flush_context):
+  note_facet_changes(session, [(instance.__tablename__.lower(), instance.id)
+    for instance in chain(session.new, session.dirty, session.deleted)
+    if isinstance(instance, (Venue, Artist))])
+
+@event.listens_for(Session, 'after_commit')
+def apply_facet_changes(session):
+  changes = session.info.pop('facets', None)
+  if changes and facet_index.loaded:
+    facet_index.invalidate(changes)
+
+@event.listens_for(Session, 'after_rollback')
+def discard_facet_changes(session):
+  session.info.pop('facets', None)
+
+facet_sync = IndexSync(load_facet_index,
+  lambda kind, ids: facet_index.invalidate((kind, entity_id) for entity_id in ids))
+
+def browse(kind):
+  # ?genre=..&genre=..[&match=all] &state=.. &seeking=yes|no &offset= &limit=
+  model, seeking_name = FACET_SOURCES[kind][:2]
+  facet_sync.sync()
+  refresh_facet_index()
+  genres, states = request.args.getlist('genre'), request.args.getlist('state')
+  genre_ids, state_ids = reference_data.genres.ids_for(genres), reference_data.states.ids_for(states)
+  seeking = request.args.get('seeking')
+  if seeking is not None:
+    seeking = FLAG_VALUES.get(seeking.lower())
+  if len(genre_ids) != len(genres) or len(state_ids) != len(states) or (
+      'seeking' in request.args and seeking is None):
+    abort(400)
+  offset = max(request.args.get('offset', 0, type=int), 0)
+  limit = min(max(request.args.get('limit', app.config['FACETS_PAGE_SIZE'], type=int), 0),
+    app.config['FACETS_PAGE_SIZE'])
+  total, ids, counts = facet_index.search(kind, genre_ids, state_ids, seeking,
+    request.args.get('match') == 'all', offset, limit)
+  names = dict(db.session.query(model.id, model.name).filter(model.id.in_(ids))) if ids else {}
+  return jsonify({
+    "count": total,
+    "data": [{"id": entity_id, "name": names[entity_id]} for entity_id in ids if entity_id in names],
+    "facets": {
+      "genres": {reference_data.genres.name(genre_id): count for genre_id, count in counts["genres"].items()},
+      "states": {reference_data.states.name(state_id): count for state_id, count in counts["states"].items()},
+      seeking_name: counts["seeking"],
+    },
+  })
+
+@app.route('/artists/browse')
+def browse_artists():
+  return browse('artist')
+
+@app.route('/venues/browse')
+def browse_venues():
+  return browse('venue')
+
+#  Recommendations
+#  ----------------------------------------------------------------
+# Venues for an artist and artists for a venue, scored by recommend.Matcher
+# over a snapshot of genres, cities, states and seeking flags. The snapshot
+# is rebuilt when older than RECOMMEND_MODEL_TTL; co-booking counts are read
+# per request from the (artist_id|venue_id, start_time) index. Results are
+# cached per entity until the snapshot or that entity's page version moves.
+
+matcher = None
+recommendation_cache = LRUBackend(app.config['RECOMMEND_CACHE_SIZE'], app.config['RECOMMEND_CACHE_TTL'])
+
+def matcher_rows(model, seeking, genre_table, owner_key):
+  genres = defaultdict(list)
+  for owner_id, genre_id in db.session.query(genre_table.c[owner_key], genre_table.c.genre_id).yield_per(5000):
+    genres[owner_id].append(genre_id)
+  rows = db.session.query(model.id, model.city, model.state, getattr(model, seeking))
+  if model is Venue:
+    rows = rows.filter(Venue.archived_at == None)
+  return [(entity_id, city, state, flag, genres[entity_id]) for entity_id, city, state, flag in rows.yield_per(5000)]
+
+def current_matcher():
+  global matcher
+  if matcher is None or time.time() - matcher.built > app.config['RECOMMEND_MODEL_TTL']:
+    matcher = Matcher(matcher_rows(*FACET_SOURCES['artist']), matcher_rows(*FACET_SOURCES['venue']))
+  return matcher
+
+def recommend(kind, entity_id):
+  model = FACET_SOURCES[kind][0]
+  other = Venue if model is Artist else Artist
+  limit = min(max(request.args.get('limit', app.config['RECOMMEND_LIMIT'], type=int), 1),
+    app.config['RECOMMEND_LIMIT'])
+  current = current_matcher()
+  if (kind, entity_id) not in current:
+    if db.session.query(model.id).filter(model.id == entity_id).first() is None:
+      abort(404)
+    # created (or archived) after the snapshot was taken
+    return jsonify({"data": [], "pending": True})
+
+  cache_key = (kind, entity_id, limit, current.built, page_cache.versions([f'{model.__tablename__}:{entity_id}']))
+  data = recommendation_cache.get(cache_key)
+  if data is None:
+    own_column, other_column = (Show.artist_id, Show.venue_id) if model is Artist else (Show.venue_id, Show.artist_id)
+    history = dict(db.session.query(other_column, db.func.count(Show.id)
+      ).filter(own_column == entity_id).group_by(other_column))
+    ranked = current.rank(kind, entity_id, history, limit)
+    names = dict(db.session.query(other.id, other.name).filter(other.id.in_([other_id for other_id, _ in ranked])))
+    data = [{"id": other_id, "name": names[other_id], "score": score}
+      for other_id, score in ranked if other_id in names]
+    recommendation_cache.set(cache_key, data)
+  return jsonify({"data": data, "pending": False})
+
+@app.route('/artists/<int:artist_id>/recommendations')
+def recommend_venues(artist_id):
+  return recommend('artist', artist_id)
+
+@app.route('/venues/<int:venue_id>/recommendations')
+def recommend_artists(venue_id):
+  return recommend('venue', venue_id)
+
+#  Page versions
+#  ----------------------------------------------------------------
+#  Signatures for conditional GET (see http_cache). Each is one query of
+#  scalar subqueries answered from indexes: a count catches deletes and
+#  max(updated_at) catches inserts and edits, including the counter updates.
+
+def table_version(*models, counted=()):
+  columns = [db.session.query(db.func.max(model.updated_at)).scalar_subquery() for model in models]
+  columns += [db.session.query(db.func.count(model.id)).scalar_subquery() for model in counted]
+  return db.session.query(*columns).one()
+
+def detail_version(model, owner_column, counterpart, owner_id, now=None):
+  # besides edits, a detail page changes when a show starts (past/upcoming
+  # split) or enters the upcoming window, so both counts are included
+  now = now or datetime.now()
+  window_end = now + timedelta(days=app.config['UPCOMING_SHOWS_WINDOW_DAYS'])
+  def shows(column, *criteria):
+    return db.session.query(column).filter(owner_column == owner_id, *criteria).scalar_subquery()
+  return db.session.query(model.updated_at,
+      shows(db.func.count(Show.id)),
+      shows(db.func.count(Show.id), Show.start_time <= now),
+      shows(db.func.count(Show.id), Show.start_time <= window_end),
+      shows(db.func.max(Show.updated_at)),
+      db.session.query(db.func.max(counterpart.updated_at)).scalar_subquery(),
+    ).filter(model.id == owner_id).first()
+
 #  Venues
 #  ----------------------------------------------------------------
 
+def venue_areas():
+  # one query over Venue/State; upcoming show counts come from the maintained
+  # Venue.upcoming_shows_count column, so no join against Show is needed
+  rows = db.session.query(
+      Venue.city, State.name, Venue.id, Venue.name, Venue.upcoming_shows_count
+    ).outerjoin(State, Venue.state == State.id
+    ).filter(Venue.archived_at == None
+    ).order_by(State.name, Venue.city, Venue.name, Venue.id
+    ).all()
+  areas = []
+  for (city, state), venues in groupby(rows, key=lambda row: (row[0], row[1])):
+    areas.append({
+      "city": city,
+      "state": state,
+      "venues": [{
+        "id": venue_id,
+        "name": name,
+        "num_upcoming_shows": num_upcoming_shows,
+      } for _, _, venue_id, name, num_upcoming_shows in venues]
+    })
+  return areas
+
 @app.route('/venues')
+@replicas.read_only
+@conditional(lambda: table_version(Venue, counted=(Venue,)))
+@page_cache.cached(key=lambda: None, depends=lambda: ('Venue', 'Show'))
 def venues():
-  # TODO: replace with real venues data.
-  #       num_shows should be aggregated based on number of upcoming shows per venue.
-  data=[{
-    "city": "San Francisco",
-    "state": "CA",
-    "venues": [{
-      "id": 1,
-      "name": "The Musical Hop",
-      "num_upcoming_shows": 0,
-    }, {
-      "id": 3,
-      "name": "Park Square Live Music & Coffee",
-      "num_upcoming_shows": 1,
-    }]
-  }, {
-    "city": "New York",
-    "state": "NY",
-    "venues": [{
-      "id": 2,
-      "name": "The Dueling Pianos Bar",
-      "num_upcoming_shows": 0,
-    }]
-  }]
-  return render_template('pages/venues.html', areas=data);
+  return render_template('pages/venues.html', areas=venue_areas())
 
 @app.route('/venues/search', methods=['POST'])
+@replicas.read_only
 def search_venues():
-  # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
-  # seach for Hop should return "The Musical Hop".
-  # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
-  response={
-    "count": 1,
-    "data": [{
-      "id": 2,
-      "name": "The Dueling Pianos Bar",
-      "num_upcoming_shows": 0,
-    }]
+  search_term = request.form.get('search_term', '')
+  response = search_by_name(Venue, search_term)
+  return render_template('pages/search_venues.html', results=response, search_term=search_term)
+
+def venue_detail(venue_id, now=None, before=None):
+  # a bounded number of queries: the venue with its state, its genres, the show
+  # counts and one page each of upcoming and past shows joined to their artist.
+  now = now or datetime.now()
+  row = db.session.query(Venue, State.name).outerjoin(State, Venue.state == State.id
+    ).filter(Venue.id == venue_id).first()
+  if row is None:
+    return None
+  venue, state = row
+  genres = [name for name, in db.session.query(Genre.name).join(
+      venueGenres, venueGenres.c.genre_id == Genre.id
+    ).filter(venueGenres.c.venue_id == venue_id).order_by(Genre.name)]
+  past_shows_count, upcoming_shows_count = show_counts(Show.venue_id, venue_id, now)
+  past_shows, upcoming_shows, next_past_cursor = show_history(
+    Show.venue_id, venue_id, Artist, 'artist', now, before)
+  return {
+    "id": venue.id,
+    "name": venue.name,
+    "genres": genres,
+    "address": venue.address,
+    "city": venue.city,
+    "state": state,
+    "phone": venue.phone,
+    "website": venue.website,
+    "facebook_link": venue.facebook_link,
+    "seeking_talent": venue.seeking_talent,
+    "seeking_description": venue.seeking_description,
+    "image_link": venue.image_link,
+    "past_shows": past_shows,
+    "upcoming_shows": upcoming_shows,
+    "past_shows_count": past_shows_count,
+    "upcoming_shows_count": upcoming_shows_count,
+    "next_past_cursor": next_past_cursor,
+    "archived": venue.archived_at is not None,
   }
-  return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
 
 @app.route('/venues/<int:venue_id>')
+@replicas.read_only
+@conditional(lambda venue_id: detail_version(Venue, Show.venue_id, Artist, venue_id))
+@page_cache.cached(key=lambda venue_id: request.args.get('before'),
+  depends=lambda venue_id: (f'Venue:{venue_id}', 'Artist'))
 def show_venue(venue_id):
   # shows the venue page with the given venue_id
-  # TODO: replace with real venue data from the venues table, using venue_id
-  data1={
-    "id": 1,
-    "name": "The Musical Hop",
-    "genres": ["Jazz", "Reggae", "Swing", "Classical", "Folk"],
-    "address": "1015 Folsom Street",
-    "city": "San Francisco",
-    "state": "CA",
-    "phone": "123-123-1234",
-    "website": "https://www.themusicalhop.com",
-    "facebook_link": "https://www.facebook.com/TheMusicalHop",
-    "seeking_talent": True,
-    "seeking_description": "We are on the lookout for a local artist to play every two weeks. Please call us.",
-    "image_link": "https://images.unsplash.com/photo-1543900694-133f37abaaa5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=400&q=60",
-    "past_shows": [{
-      "artist_id": 4,
-      "artist_name": "Guns N Petals",
-      "artist_image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80",
-      "start_time": "2019-05-21T21:30:00.000Z"
-    }],
-    "upcoming_shows": [],
-    "past_shows_count": 1,
-    "upcoming_shows_count": 0,
-  }
-  data2={
-    "id": 2,
-    "name": "The Dueling Pianos Bar",
-    "genres": ["Classical", "R&B", "Hip-Hop"],
-    "address": "335 Delancey Street",
-    "city": "New York",
-    "state": "NY",
-    "phone": "914-003-1132",
-    "website": "https://www.theduelingpianos.com",
-    "facebook_link": "https://www.facebook.com/theduelingpianos",
-    "seeking_talent": False,
-    "image_link": "https://images.unsplash.com/photo-1497032205916-ac775f0649ae?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=750&q=80",
-    "past_shows": [],
-    "upcoming_shows": [],
-    "past_shows_count": 0,
-    "upcoming_shows_count": 0,
-  }
-  data3={
-    "id": 3,
-    "name": "Park Square Live Music & Coffee",
-    "genres": ["Rock n Roll", "Jazz", "Classical", "Folk"],
-    "address": "34 Whiskey Moore Ave",
-    "city": "San Francisco",
-    "state": "CA",
-    "phone": "415-000-1234",
-    "website": "https://www.parksquarelivemusicandcoffee.com",
-    "facebook_link": "https://www.facebook.com/ParkSquareLiveMusicAndCoffee",
-    "seeking_talent": False,
-    "image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
-    "past_shows": [{
-      "artist_id": 5,
-      "artist_name": "Matt Quevedo",
-      "artist_image_link": "https://images.unsplash.com/photo-1495223153807-b916f75de8c5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=334&q=80",
-      "start_time": "2019-06-15T23:00:00.000Z"
-    }],
-    "upcoming_shows": [{
-      "artist_id": 6,
-      "artist_name": "The Wild Sax Band",
-      "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-      "start_time": "2035-04-01T20:00:00.000Z"
-    }, {
-      "artist_id": 6,
-      "artist_name": "The Wild Sax Band",
-      "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-      "start_time": "2035-04-08T20:00:00.000Z"
-    }, {
-      "artist_id": 6,
-      "artist_name": "The Wild Sax Band",
-      "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-      "start_time": "2035-04-15T20:00:00.000Z"
-    }],
-    "past_shows_count": 1,
-    "upcoming_shows_count": 1,
-  }
-  data = list(filter(lambda d: d['id'] == venue_id, [data1, data2, data3]))[0]
-  return render_template('pages/show_venue.html', venue=data)
+  before = request.args.get('before')
+  data = venue_detail(venue_id, before=decode_show_cursor(before) if before else None)
+  if data is None:
+    abort(404)
+  return render_template('pages/show_venue.html', venue=data,
+    upcoming_window_days=app.config['UPCOMING_SHOWS_WINDOW_DAYS'])
+
+#  Create
+#  ----------------------------------------------------------------
+#  Venues and artists are always created as a batch, a form post being a
+#  batch of one. The state and genre names of the whole batch are resolved in
+#  one UNION ALL query, the new rows are flushed once (with psycopg2 the ORM
+#  batches them into multi-row INSERT ... RETURNING statements) and every
+#  genre link goes out in one executemany INSERT. The flush fires the usual listeners (page cache,
+#  autocomplete); callers commit.
+
+EDITABLE_COLUMNS = {
+  'Venue': ('name', 'city', 'state', 'address', 'phone', 'image_link',
+    'facebook_link', 'website', 'seeking_talent', 'seeking_description'),
+  'Artist': ('name', 'city', 'state', 'phone', 'image_link',
+    'facebook_link', 'website', 'seeking_venue', 'seeking_description'),
+}
+REQUIRED_COLUMNS = ('name', 'city', 'state')
+FLAG_COLUMNS = ('seeking_talent', 'seeking_venue')
+FLAG_VALUES = {'yes': True, 'no': False, 'true': True, 'false': False, '1': True, '0': False}
+GENRE_LINKS = {'Venue': (venueGenres, 'venue_id'), 'Artist': (artistGenres, 'artist_id')}
+
+def resolve_names(state_names, genre_names):
+  states = db.session.query(db.literal('state'), State.name, State.id).filter(State.name.in_(state_names))
+  genres = db.session.query(db.literal('genre'), Genre.name, Genre.id).filter(Genre.name.in_(genre_names))
+  found = {'state': {}, 'genre': {}}
+  for kind, name, row_id in states.union_all(genres):
+    found[kind][name] = row_id
+  return found['state'], found['genre']
+
+def new_owner_values(model, record):
+  # column values (state still a name) for one record; raises ValueError
+  values = {}
+  for column in EDITABLE_COLUMNS[model.__tablename__]:
+    value = record.get(column)
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+      # JSON numbers, e.g. "seeking_venue": 1
+      value = str(value)
+    elif value is not None and not isinstance(value, str) and not (
+        isinstance(value, bool) and column in FLAG_COLUMNS):
+      raise ValueError(f'invalid {column}')
+    if isinstance(value, str):
+      value = value.strip() or None
+    if column in FLAG_COLUMNS and not isinstance(value, bool):
+      value = FLAG_VALUES.get((value or 'no').lower())
+    if value is None and (column in REQUIRED_COLUMNS or column in FLAG_COLUMNS):
+      raise ValueError(f'invalid {column}')
+    values[column] = value
+  return values
+
+def create_owners(model, records):
+  # Returns (created entities, errors). Errors are {"row", "error"} dicts
+  # with 1-based row numbers; those records are skipped, the rest created.
+  parsed, errors = [], []
+  for row_number, record in enumerate(records, 1):
+    try:
+      parsed.append((row_number, new_owner_values(model, record), set(record.get('genres') or ())))
+    except ValueError as e:
+      errors.append({"row": row_number, "error": str(e)})
+  state_ids, genre_ids = resolve_names({values['state'] for _, values, _ in parsed},
+    set().union(*(genres for _, _, genres in parsed)))
+
+  created = []
+  for row_number, values, genres in parsed:
+    unknown = sorted(genre for genre in genres if genre not in genre_ids)
+    if values['state'] not in state_ids:
+      errors.append({"row": row_number, "error": f'unknown state {values["state"]}'})
+    elif unknown:
+      errors.append({"row": row_number, "error": 'unknown genres ' + ', '.join(unknown)})
+    else:
+      values['state'] = state_ids[values['state']]
+      created.append((model(**values), sorted(genre_ids[genre] for genre in genres)))
+  if not created:
+    return [], errors
+
+  db.session.add_all(entity for entity, _ in created)
+  db.session.flush()
+  genre_table, owner_key = GENRE_LINKS[model.__tablename__]
+  links = [{owner_key: entity.id, "genre_id": genre_id} for entity, genres in created for genre_id in genres]
+  if links:
+    db.session.execute(genre_table.insert(), links)
+  return [entity for entity, _ in created], sorted(errors, key=lambda error: error["row"])
+
+def submit_new(model, form, form_view):
+  # the form post path: validate, create one record, show it
+  kind = model.__tablename__
+  if not form.validate():
+    flash(form.errors)
+    return redirect(url_for(form_view))
+  record = request.form.to_dict()
+  record['genres'] = request.form.getlist('genres')
+  try:
+    created, errors = create_owners(model, [record])
+    if errors:
+      db.session.rollback()
+      flash(f'{kind} could not be listed: {errors[0]["error"]}.')
+      return redirect(url_for(form_view))
+    # read before the commit expires the instance
+    entity_id, name = created[0].id, created[0].name
+    db.session.commit()
+  except Exception:
+    db.session.rollback()
+    app.logger.exception(f'could not create {kind}')
+    flash(f'An error occurred. {kind} ' + request.form.get('name', '') + ' could not be listed.')
+    return redirect(url_for(form_view))
+  flash(f'{kind} {name} was successfully listed!')
+  return redirect(url_for('show_' + kind.lower(), **{kind.lower() + '_id': entity_id}))
 
 #  Create Venue
 #  ----------------------------------------------------------------
@@ -343,226 +951,285 @@ def create_venue_form():
 
 @app.route('/venues/create', methods=['POST'])
 def create_venue_submission():
-  # TODO: insert form data as a new Venue record in the db, instead
-  # TODO: modify data to be the data object returned from db insertion
-    form = VenueForm()
-    err = False
-    name = request.form.get('name').strip()
-    city = request.form.get('city').strip()
-    state = getKeys(stateDict,request.form.getlist('state'))
-    address = request.form.get('address').strip()
-    phone = request.form.get('phone').strip()
-    image_link = request.form.get('image_link').strip()
-    facebook_link = request.form.get('facebook_link').strip()
-    website = request.form.get('website').strip()
-    if request.form.get('seeking_talent') == 'yes':
-      seeking_talent = True
-    elif request.form.get('seeking_talent') == 'no':
-      seeking_talent = False  
-    seeking_description = request.form.get('seeking_description').strip()
-    genres = getKeys(genreDict,request.form.getlist('genres'))
-    if not form.validate():
-        flash( form.errors )
-        return redirect(url_for('create_venue_submission'))
-  
-    else:
-      #
-        try: 
-            new_venue = Venue(name=name, city=city, state=state, address=address, phone=phone, \
-                  image_link=image_link,facebook_link=facebook_link,website=website, \
-                  seeking_talent=seeking_talent, seeking_description=seeking_description)
-            #for genre in genres:      
-              #new_venue.genres.append(genre)
-
-            db.session.add(new_venue)
-            db.session.commit()
-            err = False
-
-        except Exception as e:
-            err = True
-            print(f'Exception "{e}"  in creating a new venue')
-            db.session.rollback()  
-        finally:
-            db.session.close()
-        if err == False:
-          flash('Venue ' + request.form['name'] + ' was successfully listed!')
-          return render_template('pages/home.html')
-        else: 
-          flash('An error occurred. Venue ' + request.form['name'] + ' was unsuccessfully listed please retry.')
-          return redirect(url_for('create_venue_submission'))  
-
-@app.route('/venues/<venue_id>', methods=['DELETE'])
+  return submit_new(Venue, VenueForm(), 'create_venue_form')
+
+#  Delete
+#  ----------------------------------------------------------------
+#  Venues and artists are removed with set-based statements inside one
+#  transaction; no Show or genre link is loaded into the session. Upcoming
+#  show counters of the other side are adjusted from one GROUP BY first.
+#  Archiving a venue keeps its row and past shows (so artist histories stay
+#  intact), cancels its upcoming shows and hides it from listings, search,
+#  autocomplete and new bookings.
+
+def remove_owner(model, entity_id, archive=False, now=None):
+  # returns False when there is no such row
+  now = now or datetime.now()
+  if model is Venue:
+    owner_column, counterpart, counterpart_column, genre_column = (
+      Show.venue_id, Artist, Show.artist_id, venueGenres.c.venue_id)
+  else:
+    owner_column, counterpart, counterpart_column, genre_column = (
+      Show.artist_id, Venue, Show.venue_id, artistGenres.c.artist_id)
+  if db.session.query(model.id).filter(model.id == entity_id).first() is None:
+    return False
+  connection = db.session.connection()
+  shows = [owner_column == entity_id]
+  if archive:
+    shows.append(Show.start_time > now)
+  upcoming = db.session.query(counterpart_column, db.func.count(Show.id)).filter(
+    owner_column == entity_id, Show.start_time > now).group_by(counterpart_column)
+  adjust_upcoming_counts(connection, counterpart, {owner_id: -count for owner_id, count in upcoming})
+  connection.execute(Show.__table__.delete().where(*shows))
+
+  table = model.__table__
+  if archive:
+    connection.execute(table.update().where(table.c.id == entity_id).values(
+      archived_at=now, upcoming_shows_count=0, version=table.c.version + 1))
+  else:
+    connection.execute(genre_column.table.delete().where(genre_column == entity_id))
+    connection.execute(table.delete().where(table.c.id == entity_id))
+
+  kind = model.__tablename__
+  note_cache_changes(db.session, (kind, f'{kind}:{entity_id}', 'Show'))
+  note_name_change(db.session, 'remove', kind.lower(), entity_id)
+  note_facet_changes(db.session, [(kind.lower(), entity_id)])
+  db.session.commit()
+  return True
+
+def delete_response(model, entity_id, archive=False):
+  try:
+    found = remove_owner(model, entity_id, archive)
+  except Exception:
+    db.session.rollback()
+    app.logger.exception(f'could not delete {model.__tablename__} {entity_id}')
+    return jsonify({"success": False}), 500
+  if not found:
+    abort(404)
+  return jsonify({"success": True, "archived": archive})
+
+@app.route('/venues/<int:venue_id>', methods=['DELETE'])
 def delete_venue(venue_id):
-  # TODO: Complete this endpoint for taking a venue_id, and using
-  # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
+  # ?archive=1 keeps the venue and its past shows instead of deleting them
+  return delete_response(Venue, venue_id, request.args.get('archive', '') in ('1', 'true', 'yes'))
 
-  # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
-  # clicking that button delete it from the db then redirect the user to the homepage
-  return None
+@app.route('/artists/<int:artist_id>', methods=['DELETE'])
+def delete_artist(artist_id):
+  return delete_response(Artist, artist_id)
 
 #  Artists
 #  ----------------------------------------------------------------
 @app.route('/artists')
+@replicas.read_only
+@conditional(lambda: table_version(Artist, counted=(Artist,)))
+@page_cache.cached(key=lambda: None, depends=lambda: ('Artist',))
 def artists():
-  # TODO: replace with real data returned from querying the database
-  data=[{
-    "id": 4,
-    "name": "Guns N Petals",
-  }, {
-    "id": 5,
-    "name": "Matt Quevedo",
-  }, {
-    "id": 6,
-    "name": "The Wild Sax Band",
-  }]
+  data = [{"id": artist_id, "name": name} for artist_id, name in
+    db.session.query(Artist.id, Artist.name).order_by(Artist.name, Artist.id)]
   return render_template('pages/artists.html', artists=data)
 
 @app.route('/artists/search', methods=['POST'])
+@replicas.read_only
 def search_artists():
-  # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
-  # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
-  # search for "band" should return "The Wild Sax Band".
-  response={
-    "count": 1,
-    "data": [{
-      "id": 4,
-      "name": "Guns N Petals",
-      "num_upcoming_shows": 0,
-    }]
+  search_term = request.form.get('search_term', '')
+  response = search_by_name(Artist, search_term)
+  return render_template('pages/search_artists.html', results=response, search_term=search_term)
+
+def artist_detail(artist_id, now=None, before=None):
+  # mirrors venue_detail: artist with state, genres, counts, one page of shows
+  now = now or datetime.now()
+  row = db.session.query(Artist, State.name).outerjoin(State, Artist.state == State.id
+    ).filter(Artist.id == artist_id).first()
+  if row is None:
+    return None
+  artist, state = row
+  genres = [name for name, in db.session.query(Genre.name).join(
+      artistGenres, artistGenres.c.genre_id == Genre.id
+    ).filter(artistGenres.c.artist_id == artist_id).order_by(Genre.name)]
+  past_shows_count, upcoming_shows_count = show_counts(Show.artist_id, artist_id, now)
+  past_shows, upcoming_shows, next_past_cursor = show_history(
+    Show.artist_id, artist_id, Venue, 'venue', now, before)
+  return {
+    "id": artist.id,
+    "name": artist.name,
+    "genres": genres,
+    "city": artist.city,
+    "state": state,
+    "phone": artist.phone,
+    "website": artist.website,
+    "facebook_link": artist.facebook_link,
+    "seeking_venue": artist.seeking_venue,
+    "seeking_description": artist.seeking_description,
+    "image_link": artist.image_link,
+    "past_shows": past_shows,
+    "upcoming_shows": upcoming_shows,
+    "past_shows_count": past_shows_count,
+    "upcoming_shows_count": upcoming_shows_count,
+    "next_past_cursor": next_past_cursor,
   }
-  return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
 
 @app.route('/artists/<int:artist_id>')
+@replicas.read_only
+@conditional(lambda artist_id: detail_version(Artist, Show.artist_id, Venue, artist_id))
+@page_cache.cached(key=lambda artist_id: request.args.get('before'),
+  depends=lambda artist_id: (f'Artist:{artist_id}', 'Venue'))
 def show_artist(artist_id):
-  # shows the venue page with the given venue_id
-  # TODO: replace with real venue data from the venues table, using venue_id
-  data1={
-    "id": 4,
-    "name": "Guns N Petals",
-    "genres": ["Rock n Roll"],
-    "city": "San Francisco",
-    "state": "CA",
-    "phone": "326-123-5000",
-    "website": "https://www.gunsnpetalsband.com",
-    "facebook_link": "https://www.facebook.com/GunsNPetals",
-    "seeking_venue": True,
-    "seeking_description": "Looking for shows to perform at in the San Francisco Bay Area!",
-    "image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80",
-    "past_shows": [{
-      "venue_id": 1,
-      "venue_name": "The Musical Hop",
-      "venue_image_link": "https://images.unsplash.com/photo-1543900694-133f37abaaa5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=400&q=60",
-      "start_time": "2019-05-21T21:30:00.000Z"
-    }],
-    "upcoming_shows": [],
-    "past_shows_count": 1,
-    "upcoming_shows_count": 0,
-  }
-  data2={
-    "id": 5,
-    "name": "Matt Quevedo",
-    "genres": ["Jazz"],
-    "city": "New York",
-    "state": "NY",
-    "phone": "300-400-5000",
-    "facebook_link": "https://www.facebook.com/mattquevedo923251523",
-    "seeking_venue": False,
-    "image_link": "https://images.unsplash.com/photo-1495223153807-b916f75de8c5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=334&q=80",
-    "past_shows": [{
-      "venue_id": 3,
-      "venue_name": "Park Square Live Music & Coffee",
-      "venue_image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
-      "start_time": "2019-06-15T23:00:00.000Z"
-    }],
-    "upcoming_shows": [],
-    "past_shows_count": 1,
-    "upcoming_shows_count": 0,
-  }
-  data3={
-    "id": 6,
-    "name": "The Wild Sax Band",
-    "genres": ["Jazz", "Classical"],
-    "city": "San Francisco",
-    "state": "CA",
-    "phone": "432-325-5432",
-    "seeking_venue": False,
-    "image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-    "past_shows": [],
-    "upcoming_shows": [{
-      "venue_id": 3,
-      "venue_name": "Park Square Live Music & Coffee",
-      "venue_image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
-      "start_time": "2035-04-01T20:00:00.000Z"
-    }, {
-      "venue_id": 3,
-      "venue_name": "Park Square Live Music & Coffee",
-      "venue_image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
-      "start_time": "2035-04-08T20:00:00.000Z"
-    }, {
-      "venue_id": 3,
-      "venue_name": "Park Square Live Music & Coffee",
-      "venue_image_link": "https://images.unsplash.com/photo-1485686531765-ba63b07845a7?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=747&q=80",
-      "start_time": "2035-04-15T20:00:00.000Z"
-    }],
-    "past_shows_count": 0,
-    "upcoming_shows_count": 3,
-  }
-  data = list(filter(lambda d: d['id'] == artist_id, [data1, data2, data3]))[0]
-  return render_template('pages/show_artist.html', artist=data)
+  # shows the artist page with the given artist_id
+  before = request.args.get('before')
+  data = artist_detail(artist_id, before=decode_show_cursor(before) if before else None)
+  if data is None:
+    abort(404)
+  return render_template('pages/show_artist.html', artist=data,
+    upcoming_window_days=app.config['UPCOMING_SHOWS_WINDOW_DAYS'])
 
 #  Update
 #  ----------------------------------------------------------------
+#  An edit is one UPDATE ... WHERE id = :id AND version = :version that sets
+#  only the columns whose value changed plus the version bump. The version is
+#  the one the edit form was rendered with, so saving over somebody else's
+#  newer edit is reported as a conflict instead of silently undoing it.
+#  Genre links are diffed against the stored ones and only the difference is
+#  deleted/inserted. Submitted fields go through the same form validators as
+#  on create; fields missing from the submission are left alone.
+
+class EditConflict(Exception):
+  pass
+
+def submitted_changes(model, form):
+  # (column values, genre ids or None) for the fields present in `form`;
+  # raises ValueError for values the edit form could not have produced
+  values = {}
+  for column in EDITABLE_COLUMNS[model.__tablename__]:
+    if column not in form:
+      continue
+    value = form.get(column).strip()
+    if column == 'state':
+      value = reference_data.states.id(value)
+    elif column in FLAG_COLUMNS:
+      value = FLAG_VALUES.get(value.lower())
+    else:
+      value = value or None
+    if value is None and (column in REQUIRED_COLUMNS or column in FLAG_COLUMNS):
+      raise ValueError(f'invalid {column}')
+    values[column] = value
+  genre_ids = None
+  if 'genres' in form:
+    genre_ids = set(reference_data.genres.ids_for(form.getlist('genres')))
+  return values, genre_ids
+
+def apply_edit(model, entity_id, version, values, genre_ids=None):
+  # returns False when the submission matches what is stored. Raises
+  # LookupError for a missing row and EditConflict when `version` is stale.
+  table = model.__table__
+  genre_table, owner_key = GENRE_LINKS[model.__tablename__]
+  columns = [getattr(model, column) for column in values]
+  if model is Venue:
+    columns.append(Venue.archived_at)
+  current = db.session.query(model.version, *columns).filter(model.id == entity_id).first()
+  if current is None:
+    raise LookupError(entity_id)
+  changes = {column: value for column, value in values.items() if getattr(current, column) != value}
+  added = removed = ()
+  if genre_ids is not None:
+    stored = {genre_id for genre_id, in db.session.query(genre_table.c.genre_id
+      ).filter(genre_table.c[owner_key] == entity_id)}
+    added, removed = genre_ids - stored, stored - genre_ids
+  if not (changes or added or removed):
+    return False
+
+  result = db.session.execute(table.update().where(
+      table.c.id == entity_id, table.c.version == version
+    ).values(version=table.c.version + 1, **changes))
+  if result.rowcount != 1:
+    db.session.rollback()
+    raise EditConflict(entity_id)
+  if removed:
+    db.session.execute(genre_table.delete().where(
+      genre_table.c[owner_key] == entity_id, genre_table.c.genre_id.in_(removed)))
+  if added:
+    db.session.execute(genre_table.insert(),
+      [{owner_key: entity_id, "genre_id": genre_id} for genre_id in sorted(added)])
+  # Core statements skip the flush listeners
+  kind = model.__tablename__
+  note_cache_changes(db.session, (kind, f'{kind}:{entity_id}'))
+  note_facet_changes(db.session, [(kind.lower(), entity_id)])
+  # archived venues stay out of autocomplete
+  if 'name' in changes and getattr(current, 'archived_at', None) is None:
+    note_name_change(db.session, 'add', kind.lower(), entity_id, changes['name'])
+  db.session.commit()
+  return True
+
+def edit_form_data(model, entity_id):
+  entity = db.session.get(model, entity_id)
+  if entity is None:
+    abort(404)
+  genre_table, owner_key = GENRE_LINKS[model.__tablename__]
+  data = {column: getattr(entity, column) for column in EDITABLE_COLUMNS[model.__tablename__]}
+  data.update({
+    "id": entity.id,
+    "version": entity.version,
+    "state": reference_data.states.name(entity.state),
+    "genres": [reference_data.genres.name(genre_id) for genre_id, in db.session.query(
+      genre_table.c.genre_id).filter(genre_table.c[owner_key] == entity_id)],
+  })
+  for column in FLAG_COLUMNS:
+    if column in data:
+      data[column] = 'yes' if data[column] else 'no'
+  return data
+
+def submitted_errors(form, submitted):
+  # runs the form's validators on the fields present in the submission only,
+  # so an edit can leave the others alone; {field: [errors]}
+  errors = {}
+  for name in submitted:
+    field = form._fields.get(name)
+    if field is not None and not field.validate(form):
+      errors[name] = field.errors
+  return errors
+
+def submit_edit(model, form, entity_id, edit_view, done_view):
+  kind = model.__tablename__
+  version = request.form.get('version', type=int)
+  if version is None:
+    abort(400)
+  errors = submitted_errors(form, request.form)
+  if errors:
+    flash(errors)
+    return redirect(url_for(edit_view, **{kind.lower() + '_id': entity_id}))
+  try:
+    values, genre_ids = submitted_changes(model, request.form)
+    apply_edit(model, entity_id, version, values, genre_ids)
+  except ValueError as e:
+    flash(f'{kind} could not be updated: {e}.')
+    return redirect(url_for(edit_view, **{kind.lower() + '_id': entity_id}))
+  except LookupError:
+    abort(404)
+  except EditConflict:
+    flash(f'{kind} was changed by someone else while you were editing. '
+      'The form now shows the latest version; please reapply your changes.')
+    return redirect(url_for(edit_view, **{kind.lower() + '_id': entity_id}))
+  flash(f'{kind} was successfully updated!')
+  return redirect(url_for(done_view, **{kind.lower() + '_id': entity_id}))
+
 @app.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
-  form = ArtistForm()
-  artist={
-    "id": 4,
-    "name": "Guns N Petals",
-    "genres": ["Rock n Roll"],
-    "city": "San Francisco",
-    "state": "CA",
-    "phone": "326-123-5000",
-    "website": "https://www.gunsnpetalsband.com",
-    "facebook_link": "https://www.facebook.com/GunsNPetals",
-    "seeking_venue": True,
-    "seeking_description": "Looking for shows to perform at in the San Francisco Bay Area!",
-    "image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80"
-  }
-  # TODO: populate form with fields from artist with ID <artist_id>
+  artist = edit_form_data(Artist, artist_id)
+  form = ArtistForm(data=artist)
   return render_template('forms/edit_artist.html', form=form, artist=artist)
 
 @app.route('/artists/<int:artist_id>/edit', methods=['POST'])
 def edit_artist_submission(artist_id):
-  # TODO: take values from the form submitted, and update existing
-  # artist record with ID <artist_id> using the new attributes
-
-  return redirect(url_for('show_artist', artist_id=artist_id))
+  return submit_edit(Artist, ArtistForm(), artist_id, 'edit_artist', 'show_artist')
 
 @app.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
-  form = VenueForm()
-  venue={
-    "id": 1,
-    "name": "The Musical Hop",
-    "genres": ["Jazz", "Reggae", "Swing", "Classical", "Folk"],
-    "address": "1015 Folsom Street",
-    "city": "San Francisco",
-    "state": "CA",
-    "phone": "123-123-1234",
-    "website": "https://www.themusicalhop.com",
-    "facebook_link": "https://www.facebook.com/TheMusicalHop",
-    "seeking_talent": True,
-    "seeking_description": "We are on the lookout for a local artist to play every two weeks. Please call us.",
-    "image_link": "https://images.unsplash.com/photo-1543900694-133f37abaaa5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=400&q=60"
-  }
-  # TODO: populate form with values from venue with ID <venue_id>
+  venue = edit_form_data(Venue, venue_id)
+  form = VenueForm(data=venue)
   return render_template('forms/edit_venue.html', form=form, venue=venue)
 
 @app.route('/venues/<int:venue_id>/edit', methods=['POST'])
 def edit_venue_submission(venue_id):
-  # TODO: take values from the form submitted, and update existing
-  # venue record with ID <venue_id> using the new attributes
-  return redirect(url_for('show_venue', venue_id=venue_id))
+  return submit_edit(Venue, VenueForm(), venue_id, 'edit_venue', 'show_venue')
 
 #  Create Artist
 #  ----------------------------------------------------------------
@@ -574,62 +1241,48 @@ def create_artist_form():
 
 @app.route('/artists/create', methods=['POST'])
 def create_artist_submission():
-  # called upon submitting the new artist listing form
-  # TODO: insert form data as a new Venue record in the db, instead
-  # TODO: modify data to be the data object returned from db insertion
-
-  # on successful db insert, flash success
-  flash('Artist ' + request.form['name'] + ' was successfully listed!')
-  # TODO: on unsuccessful db insert, flash an error instead.
-  # e.g., flash('An error occurred. Artist ' + data.name + ' could not be listed.')
-  return render_template('pages/home.html')
+  return submit_new(Artist, ArtistForm(), 'create_artist_form')
 
 
 #  Shows
 #  ----------------------------------------------------------------
 
+def iter_shows():
+  # one query over Show joined to Venue and Artist, fetched in batches of
+  # SHOWS_STREAM_BATCH rows (a server-side cursor on PostgreSQL)
+  rows = db.session.query(
+      Show.venue_id, Venue.name, Show.artist_id, Artist.name, Artist.image_link, Show.start_time
+    ).join(Venue, Show.venue_id == Venue.id
+    ).join(Artist, Show.artist_id == Artist.id
+    ).order_by(Show.start_time, Show.id
+    ).yield_per(app.config['SHOWS_STREAM_BATCH'])
+  for venue_id, venue_name, artist_id, artist_name, artist_image_link, start_time in rows:
+    yield {
+      "venue_id": venue_id,
+      "venue_name": venue_name,
+      "artist_id": artist_id,
+      "artist_name": artist_name,
+      "artist_image_link": artist_image_link,
+      "start_time": start_time,
+    }
+
+def stream_template(template_name, **context):
+  # render a template chunk by chunk as its iterables are consumed
+  app.update_template_context(context)
+  stream = app.jinja_env.get_template(template_name).stream(context)
+  stream.enable_buffering(app.config['SHOWS_STREAM_BUFFER'])
+  return stream
+
 @app.route('/shows')
+@replicas.read_only
+@conditional(lambda: table_version(Show, Venue, Artist, counted=(Show,)))
 def shows():
-  # displays list of shows at /shows
-  # TODO: replace with real venues data.
-  #       num_shows should be aggregated based on number of upcoming shows per venue.
-  data=[{
-    "venue_id": 1,
-    "venue_name": "The Musical Hop",
-    "artist_id": 4,
-    "artist_name": "Guns N Petals",
-    "artist_image_link": "https://images.unsplash.com/photo-1549213783-8284d0336c4f?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=300&q=80",
-    "start_time": "2019-05-21T21:30:00.000Z"
-  }, {
-    "venue_id": 3,
-    "venue_name": "Park Square Live Music & Coffee",
-    "artist_id": 5,
-    "artist_name": "Matt Quevedo",
-    "artist_image_link": "https://images.unsplash.com/photo-1495223153807-b916f75de8c5?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=334&q=80",
-    "start_time": "2019-06-15T23:00:00.000Z"
-  }, {
-    "venue_id": 3,
-    "venue_name": "Park Square Live Music & Coffee",
-    "artist_id": 6,
-    "artist_name": "The Wild Sax Band",
-    "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-    "start_time": "2035-04-01T20:00:00.000Z"
-  }, {
-    "venue_id": 3,
-    "venue_name": "Park Square Live Music & Coffee",
-    "artist_id": 6,
-    "artist_name": "The Wild Sax Band",
-    "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-    "start_time": "2035-04-08T20:00:00.000Z"
-  }, {
-    "venue_id": 3,
-    "venue_name": "Park Square Live Music & Coffee",
-    "artist_id": 6,
-    "artist_name": "The Wild Sax Band",
-    "artist_image_link": "https://images.unsplash.com/photo-1558369981-f9ca78462e61?ixlib=rb-1.2.1&ixid=eyJhcHBfaWQiOjEyMDd9&auto=format&fit=crop&w=794&q=80",
-    "start_time": "2035-04-15T20:00:00.000Z"
-  }]
-  return render_template('pages/shows.html', shows=data)
+  # displays list of shows at /shows. The layout pops pending flashes while
+  # rendering, which a streamed body does after the session cookie is sent,
+  # so those are rendered in one piece.
+  if app.config['STREAM_SHOWS_PAGE'] and not session.get('_flashes'):
+    return Response(stream_with_context(stream_template('pages/shows.html', shows=iter_shows())))
+  return render_template('pages/shows.html', shows=list(iter_shows()))
 
 @app.route('/shows/create')
 def create_shows():
@@ -640,15 +1293,257 @@ def create_shows():
 @app.route('/shows/create', methods=['POST'])
 def create_show_submission():
   # called to create new shows in the db, upon submitting new show listing form
-  # TODO: insert form data as a new Show record in the db, instead
-
-  # on successful db insert, flash success
+  form = ShowForm()
+  if not form.validate():
+    flash(form.errors)
+    return redirect(url_for('create_shows'))
+  try:
+    show = Show(artist_id=int(form.artist_id.data), venue_id=int(form.venue_id.data),
+      start_time=form.start_time.data)
+    lock_owners([show.venue_id], [show.artist_id])
+    venue_ids, artist_ids = known_owner_ids([show.venue_id], [show.artist_id])
+    if not venue_ids or not artist_ids:
+      flash('Show could not be listed: unknown artist or venue.')
+      return redirect(url_for('create_shows'))
+    conflict = booking_conflicts([(0, show.artist_id, show.venue_id, show.start_time)]).get(0)
+    if conflict:
+      flash(f'Show could not be listed: {conflict}.')
+      return redirect(url_for('create_shows'))
+    db.session.add(show)
+    db.session.commit()
+  except Exception:
+    db.session.rollback()
+    app.logger.exception('could not create show')
+    flash('An error occurred. Show could not be listed.')
+    return redirect(url_for('create_shows'))
   flash('Show was successfully listed!')
-  # TODO: on unsuccessful db insert, flash an error instead.
-  # e.g., flash('An error occurred. Show could not be listed.')
-  # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
   return render_template('pages/home.html')
 
+def lock_owners(venue_ids, artist_ids):
+  # PostgreSQL: hold the venue and artist rows until commit so that
+  # concurrent bookings for the same owner run their conflict checks one
+  # after the other. Rows are locked in id order, venues first, so two
+  # bookings cannot deadlock on them.
+  if db.engine.dialect.name != 'postgresql':
+    return
+  for model, ids in ((Venue, venue_ids), (Artist, artist_ids)):
+    db.session.query(model.id).filter(model.id.in_(sorted(ids))).order_by(model.id).with_for_update().all()
+
+def known_owner_ids(venue_ids, artist_ids):
+  # which of the given ids exist (archived venues take no new bookings),
+  # answered in a single UNION ALL round trip
+  venues = db.session.query(db.literal('venue'), Venue.id).filter(
+    Venue.id.in_(venue_ids), Venue.archived_at == None)
+  artists = db.session.query(db.literal('artist'), Artist.id).filter(Artist.id.in_(artist_ids))
+  known = {'venue': set(), 'artist': set()}
+  for kind, owner_id in venues.union_all(artists):
+    known[kind].add(owner_id)
+  return known['venue'], known['artist']
+
+def booking_conflicts(slots):
+  # slots: (key, artist_id, venue_id, start_time). A show blocks its venue and
+  # its artist for SHOW_DURATION_MINUTES either side of its start. Existing
+  # bookings are read with one range query per owner column, served by the
+  # (venue_id, start_time) and (artist_id, start_time) indexes; slots are then
+  # checked in time order with bisect, so slots in the same batch can also
+  # clash with each other. Returns {key: error} for the slots that clash.
+  if not slots:
+    return {}
+  duration = timedelta(minutes=app.config['SHOW_DURATION_MINUTES'])
+  low = min(slot[3] for slot in slots) - duration
+  high = max(slot[3] for slot in slots) + duration
+  booked = {}
+  for kind, column, position in (('venue', Show.venue_id, 2), ('artist', Show.artist_id, 1)):
+    owners = {slot[position] for slot in slots}
+    booked[kind] = defaultdict(list)
+    for owner_id, start_time in db.session.query(column, Show.start_time).filter(
+        column.in_(owners), Show.start_time > low, Show.start_time < high
+      ).order_by(column, Show.start_time):
+      booked[kind][owner_id].append(start_time)
+
+  conflicts = {}
+  for key, artist_id, venue_id, start_time in sorted(slots, key=lambda slot: slot[3]):
+    for kind, owner_id in (('venue', venue_id), ('artist', artist_id)):
+      times = booked[kind][owner_id]
+      i = bisect.bisect_left(times, start_time - duration + timedelta(microseconds=1))
+      if i < len(times) and times[i] < start_time + duration:
+        conflicts[key] = f'{kind} {owner_id} is already booked at {times[i]}'
+        break
+    else:
+      bisect.insort(booked['venue'][venue_id], start_time)
+      bisect.insort(booked['artist'][artist_id], start_time)
+  return conflicts
+
+def insert_schedule(slots):
+  # slots from schedule.expand(). Unknown venues/artists and double bookings
+  # become per-row errors; every valid slot is written with one bulk insert and one counter
+  # update per table, all in the same transaction.
+  venue_ids, artist_ids = {slot[2] for slot in slots}, {slot[1] for slot in slots}
+  lock_owners(venue_ids, artist_ids)
+  known_venues, known_artists = known_owner_ids(venue_ids, artist_ids)
+  valid, errors = [], []
+  for row_number, artist_id, venue_id, start_time in slots:
+    if venue_id not in known_venues:
+      errors.append({"row": row_number, "error": f'unknown venue {venue_id}'})
+    elif artist_id not in known_artists:
+      errors.append({"row": row_number, "error": f'unknown artist {artist_id}'})
+    else:
+      valid.append((row_number, artist_id, venue_id, start_time))
+  # conflicts are keyed per slot so one clashing date of a recurrence does not
+  # drop the rest of it
+  conflicts = booking_conflicts([(i,) + slot[1:] for i, slot in enumerate(valid)])
+  errors += [{"row": valid[i][0], "error": error} for i, error in conflicts.items()]
+  rows = [{"artist_id": artist_id, "venue_id": venue_id, "start_time": start_time}
+    for i, (_, artist_id, venue_id, start_time) in enumerate(valid) if i not in conflicts]
+  try:
+    db.session.bulk_insert_mappings(Show, rows)
+    bump_upcoming_counts(db.session.connection(),
+      [(row['venue_id'], row['artist_id'], row['start_time']) for row in rows], 1)
+    note_cache_changes(db.session, {'Show'} | {f'Venue:{row["venue_id"]}' for row in rows}
+      | {f'Artist:{row["artist_id"]}' for row in rows})
+    db.session.commit()
+  except Exception:
+    db.session.rollback()
+    raise
+  return len(rows), errors
+
+@app.route('/shows/bulk', methods=['POST'])
+def create_show_schedule():
+  # JSON {"shows": [...]} or a CSV upload in the `file` field; see schedule.py
+  try:
+    if 'file' in request.files:
+      rows = schedule.read_csv(request.files['file'].stream)
+    else:
+      rows = schedule.read_json(request.get_json(silent=True))
+    slots, errors = schedule.expand(rows, app.config['BULK_SHOWS_MAX_SLOTS'])
+  except (schedule.ScheduleError, UnicodeDecodeError, csv.Error) as e:
+    return jsonify({"created": 0, "errors": [{"row": None, "error": str(e)}]}), 400
+  created, invalid = insert_schedule(slots)
+  errors = sorted(errors + invalid, key=lambda error: error['row'])
+  return jsonify({"created": created, "errors": errors}), 201 if created else 400
+
+#  Calendar
+#  ----------------------------------------------------------------
+#  GET /shows/calendar returns per-day or per-week show counts for a date
+#  range, optionally with the shows themselves. Counts come from one GROUP BY
+#  over the ix_Show_start_time range (or the venue/artist composite index when
+#  filtered), so no show rows are materialized for them.
+
+def calendar_range(args, today=None):
+  # (first day, day after the last) from ?range=this-week|this-weekend or
+  # ?start=YYYY-MM-DD&end=YYYY-MM-DD (inclusive, default one week)
+  today = today or date.today()
+  preset = args.get('range')
+  if preset == 'this-week':
+    first = today - timedelta(days=today.weekday())
+    last = first + timedelta(days=6)
+  elif preset == 'this-weekend':
+    # Friday to Sunday: the coming one, or the current one from Friday on
+    first = today + timedelta(days=4 - today.weekday())
+    if today.weekday() > 4:
+      first = today - timedelta(days=today.weekday() - 4)
+    last = first + timedelta(days=2)
+  elif preset is None:
+    try:
+      first = date.fromisoformat(args['start']) if 'start' in args else today
+      last = date.fromisoformat(args['end']) if 'end' in args else first + timedelta(days=6)
+    except ValueError:
+      abort(400)
+  else:
+    abort(400)
+  if last < first or (last - first).days >= app.config['CALENDAR_MAX_DAYS']:
+    abort(400)
+  return first, last + timedelta(days=1)
+
+def bucket_start(day, bucket):
+  return day - timedelta(days=day.weekday()) if bucket == 'week' else day
+
+def bucket_key(column, bucket):
+  # the bucket's first day, computed by the database
+  if db.engine.dialect.name == 'postgresql':
+    return db.func.date(db.func.date_trunc(bucket, column))
+  if bucket == 'week':
+    return db.func.date(column, 'weekday 0', '-6 days')
+  return db.func.date(column)
+
+def calendar_filters(args):
+  criteria = []
+  for param, column in (('venue_id', Show.venue_id), ('artist_id', Show.artist_id)):
+    if param in args:
+      owner_id = args.get(param, type=int)
+      if owner_id is None:
+        abort(400)
+      criteria.append(column == owner_id)
+  genres = args.getlist('genre')
+  if genres:
+    genre_ids = reference_data.genres.ids_for(genres)
+    if len(genre_ids) != len(genres):
+      abort(400)
+    # a show is in a genre when its artist is
+    criteria.append(db.exists().where(
+      artistGenres.c.artist_id == Show.artist_id, artistGenres.c.genre_id.in_(genre_ids)))
+  return criteria
+
+@app.route('/shows/calendar')
+@replicas.read_only
+def show_calendar():
+  bucket = request.args.get('bucket', 'day')
+  if bucket not in ('day', 'week'):
+    abort(400)
+  first, end = calendar_range(request.args)
+  in_range = [Show.start_time >= datetime.combine(first, datetime.min.time()),
+    Show.start_time < datetime.combine(end, datetime.min.time())] + calendar_filters(request.args)
+
+  key = bucket_key(Show.start_time, bucket)
+  counts = {str(day): count for day, count in db.session.query(key, db.func.count(Show.id)
+    ).filter(*in_range).group_by(key)}
+  buckets, day = [], bucket_start(first, bucket)
+  step = timedelta(days=7 if bucket == 'week' else 1)
+  while day < end:
+    buckets.append({"start": day.isoformat(), "count": counts.get(day.isoformat(), 0)})
+    day += step
+
+  response = {"start": first.isoformat(), "end": end.isoformat(), "bucket": bucket,
+    "total": sum(counts.values()), "buckets": buckets}
+  if request.args.get('shows') in ('1', 'true', 'yes'):
+    limit = app.config['CALENDAR_MAX_SHOWS']
+    rows = db.session.query(Show.id, Show.start_time, Show.venue_id, Venue.name, Show.artist_id, Artist.name
+      ).join(Venue, Show.venue_id == Venue.id
+      ).join(Artist, Show.artist_id == Artist.id
+      ).filter(*in_range).order_by(Show.start_time, Show.id).limit(limit).all()
+    by_bucket = {entry["start"]: entry for entry in buckets}
+    for entry in buckets:
+      entry["shows"] = []
+    for show_id, start_time, venue_id, venue_name, artist_id, artist_name in rows:
+      by_bucket[bucket_start(start_time.date(), bucket).isoformat()]["shows"].append({
+        "id": show_id,
+        "start_time": start_time.isoformat(),
+        "venue_id": venue_id,
+        "venue_name": venue_name,
+        "artist_id": artist_id,
+        "artist_name": artist_name,
+      })
+    response["truncated"] = len(rows) < response["total"]
+  return jsonify(response)
+
+#  Metrics
+#  ----------------------------------------------------------------
+
+def collect_metrics():
+  return {
+    "db": dict(pool_metrics(db.engine), **replicas.metrics()),
+    "page_cache": page_cache.stats(),
+    "log_queue_dropped": log_pipeline.dropped,
+  }
+
+@app.route('/metrics')
+def metrics():
+  return jsonify(collect_metrics())
+
+@app.route('/metrics/prometheus')
+def prometheus_metrics():
+  return Response(prometheus_text(collect_metrics()), mimetype='text/plain; version=0.0.4')
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
@@ -658,14 +1553,204 @@ def server_error(error):
     return render_template('errors/500.html'), 500
 
 
+#----------------------------------------------------------------------------#
+# Commands.
+#----------------------------------------------------------------------------#
+
+@app.cli.command('reconcile-show-counts')
+@click.option('--since-minutes', type=int, default=None,
+  help='Only reconcile owners of shows that started in the last N minutes.')
+def reconcile_show_counts_command(since_minutes):
+  """Recompute Venue/Artist upcoming_shows_count from the Show table."""
+  since = datetime.now() - timedelta(minutes=since_minutes) if since_minutes else None
+  click.echo(f'{reconcile_upcoming_counts(since)} counters updated')
+
+def bulk_load(table, rows, batch_size):
+  # COPY on PostgreSQL, executemany elsewhere; one round trip per batch
+  total = 0
+  for batch in seed_data.batches(rows, batch_size):
+    if db.engine.dialect.name == 'postgresql':
+      columns = list(batch[0])
+      buffer = io.StringIO()
+      writer = csv.writer(buffer)
+      for row in batch:
+        writer.writerow(['' if row[column] is None else row[column] for column in columns])
+      buffer.seek(0)
+      cursor = db.session.connection().connection.cursor()
+      cursor.copy_expert('COPY "{}" ({}) FROM STDIN WITH (FORMAT csv)'.format(
+        table.name, ', '.join(f'"{column}"' for column in columns)), buffer)
+    else:
+      db.session.execute(table.insert(), batch)
+    total += len(batch)
+  return total
+
+def import_owners(model, kind, path, batch_size):
+  with open(path, newline='', encoding='utf-8') as stream:
+    try:
+      records = importer.read_records(stream, path, kind)
+    except ValueError as e:
+      raise click.ClickException(str(e))
+  started = time.perf_counter()
+  created, errors = 0, []
+  for offset in range(0, len(records), batch_size):
+    entities, batch_errors = create_owners(model, records[offset:offset + batch_size])
+    db.session.commit()
+    created += len(entities)
+    errors += [dict(error, row=error["row"] + offset) for error in batch_errors]
+  click.echo(json.dumps({"created": created, "errors": errors,
+    "seconds": round(time.perf_counter() - started, 2)}))
+
+@app.cli.command('import-artists')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=1000, help='Records per flush and commit.')
+def import_artists_command(path, batch_size):
+  """Create artists from a CSV or JSON file (see importer.py)."""
+  import_owners(Artist, 'artists', path, batch_size)
+
+@app.cli.command('import-venues')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=1000, help='Records per flush and commit.')
+def import_venues_command(path, batch_size):
+  """Create venues from a CSV or JSON file (see importer.py)."""
+  import_owners(Venue, 'venues', path, batch_size)
+
+@app.cli.command('seed-synthetic')
+@click.option('--genres', default=19, help='Genres to have in total.')
+@click.option('--states', default=51, help='States to have in total.')
+@click.option('--venues', default=1000)
+@click.option('--artists', default=1000)
+@click.option('--shows', default=10000)
+@click.option('--batch-size', default=10000)
+@click.option('--seed', default=0, help='Random seed; same seed, same data.')
+def seed_synthetic_command(genres, states, venues, artists, shows, batch_size, seed):
+  """Fill the database with generated venues, artists and shows."""
+  rng = random.Random(seed)
+  started = time.perf_counter()
+  for model, wanted, rows in ((Genre, genres, seed_data.genre_rows), (State, states, seed_data.state_rows)):
+    existing = model.query.count()
+    if existing < wanted:
+      bulk_load(model.__table__, rows(wanted)[existing:], batch_size)
+  state_ids = [state_id for state_id, in db.session.query(State.id)]
+  genre_ids = [genre_id for genre_id, in db.session.query(Genre.id)]
+  high_water = {model: db.session.query(db.func.max(model.id)).scalar() or 0 for model in (Venue, Artist)}
+  bulk_load(Venue.__table__, seed_data.venue_rows(rng, venues, state_ids), batch_size)
+  bulk_load(Artist.__table__, seed_data.artist_rows(rng, artists, state_ids), batch_size)
+  new_ids = {model: [row_id for row_id, in db.session.query(model.id).filter(model.id > high_water[model])]
+    for model in (Venue, Artist)}
+  bulk_load(venueGenres, seed_data.genre_links(rng, new_ids[Venue], genre_ids, 'venue_id'), batch_size)
+  bulk_load(artistGenres, seed_data.genre_links(rng, new_ids[Artist], genre_ids, 'artist_id'), batch_size)
+  venue_ids = [venue_id for venue_id, in db.session.query(Venue.id)]
+  artist_ids = [artist_id for artist_id, in db.session.query(Artist.id)]
+  if venue_ids and artist_ids:
+    bulk_load(Show.__table__, seed_data.show_rows(rng, shows, venue_ids, artist_ids), batch_size)
+  db.session.commit()
+  # bulk loads bypass the Show events, so rebuild the counters in one pass
+  reconcile_upcoming_counts()
+  reference_data.loaded = False
+  click.echo(json.dumps({
+    "genres": Genre.query.count(), "states": State.query.count(), "venues": len(venue_ids),
+    "artists": len(artist_ids), "shows": Show.query.count(),
+    "seconds": round(time.perf_counter() - started, 2)}))
+
+@app.cli.command('benchmark')
+@click.option('--requests', default=200, help='Requests per target.')
+@click.option('--seed', default=0)
+@click.option('--output', type=click.File('w'), default='-', help='Where to write the JSON report.')
+def benchmark_command(requests, seed, output):
+  """Drive the main pages through the test client and report latency."""
+  venue_ids = [venue_id for venue_id, in db.session.query(Venue.id).limit(10000)]
+  artist_ids = [artist_id for artist_id, in db.session.query(Artist.id).limit(10000)]
+  db.session.close()
+  if not venue_ids or not artist_ids:
+    raise click.ClickException('no venues or artists; run `flask seed-synthetic` first')
+  term = lambda rng: {"search_term": rng.choice(seed_data.WORDS)[:rng.randint(2, 5)]}
+  targets = [
+    ('venues', 'GET', lambda rng: '/venues', None),
+    ('artists', 'GET', lambda rng: '/artists', None),
+    ('shows', 'GET', lambda rng: '/shows', None),
+    ('venue_detail', 'GET', lambda rng: f'/venues/{rng.choice(venue_ids)}', None),
+    ('artist_detail', 'GET', lambda rng: f'/artists/{rng.choice(artist_ids)}', None),
+    ('search_venues', 'POST', lambda rng: '/venues/search', term),
+    ('search_artists', 'POST', lambda rng: '/artists/search', term),
+  ]
+  report = benchmark.run(app.test_client(), targets, requests, seed)
+  report["_meta"] = {"requests_per_target": requests, "seed": seed,
+    "venues": len(venue_ids), "artists": len(artist_ids), "at": datetime.now().isoformat()}
+  output.write(json.dumps(report, indent=2) + '\n')
+
+@app.cli.command('benchmark-show-inserts')
+@click.option('--rows', default=500, help='Shows to create through each path.')
+@click.option('--venue-id', type=int, required=True)
+@click.option('--artist-id', type=int, required=True)
+def benchmark_show_inserts_command(rows, venue_id, artist_id):
+  """Time /shows/create one show at a time against a single /shows/bulk post.
+
+  The shows are created a year out and deleted again afterwards. Slots are
+  spaced more than twice SHOW_DURATION_MINUTES apart so none of them clash,
+  and each path gets its own time range. The speedup is only reported when
+  both paths created every show.
+  """
+  client = app.test_client()
+  step = timedelta(minutes=2 * app.config['SHOW_DURATION_MINUTES'] + 60)
+  first = datetime.now().replace(microsecond=0) + timedelta(days=365)
+  single_slots = [first + step * i for i in range(rows)]
+  bulk_slots = [first + step * (rows + 1 + i) for i in range(rows)]
+  high_water = db.session.query(db.func.max(Show.id)).scalar() or 0
+  db.session.close()
+
+  started = time.perf_counter()
+  for start_time in single_slots:
+    client.post('/shows/create', data={"artist_id": artist_id, "venue_id": venue_id,
+      "start_time": start_time.strftime('%Y-%m-%d %H:%M:%S')})
+  single = time.perf_counter() - started
+  single_created = db.session.query(db.func.count(Show.id)).filter(Show.id > high_water).scalar()
+  db.session.close()
+
+  started = time.perf_counter()
+  response = client.post('/shows/bulk', json={"shows": [{"artist_id": artist_id, "venue_id": venue_id,
+    "start_time": start_time.isoformat()} for start_time in bulk_slots]})
+  bulk = time.perf_counter() - started
+  bulk_created = response.get_json()["created"]
+
+  db.session.query(Show).filter(Show.id > high_water).delete(synchronize_session=False)
+  db.session.commit()
+  reconcile_upcoming_counts()
+  click.echo(json.dumps({"rows": rows, "single_created": single_created, "bulk_created": bulk_created,
+    "single_s": round(single, 3), "bulk_s": round(bulk, 3),
+    "speedup": round(single / bulk, 1) if bulk and single_created == bulk_created == rows else None}))
+
+@app.cli.command('seed-reference-data')
+def seed_reference_data_command():
+  """Insert any missing Genre and State rows from reference_data."""
+  for model, names in ((Genre, reference_data.GENRES), (State, reference_data.STATES)):
+    existing = {name for name, in db.session.query(model.name)}
+    db.session.add_all(model(name=name) for name in names if name not in existing)
+  db.session.commit()
+  reference_data.loaded = False
+  click.echo(f'{Genre.query.count()} genres, {State.query.count()} states')
+
+@app.cli.command('check-show-counts')
+def check_show_counts_command():
+  """Report counters that disagree with the Show table; exits 1 if any do."""
+  mismatches = upcoming_count_mismatches()
+  for table, entity_id, stored, counted in mismatches:
+    click.echo(f'{table} {entity_id}: stored {stored}, actual {counted}')
+  click.echo(f'{len(mismatches)} mismatched counters')
+  if mismatches:
+    sys.exit(1)
+
+# records are queued on the request thread and written as JSON lines by a
+# background listener; see log_pipeline.py
+log_pipeline = QueuedLogging(app.config['LOG_QUEUE_SIZE'])
+log_pipeline.add(logging.getLogger('fyyur.sql'),
+    rotating_file_handler(app.config['SLOW_QUERY_LOG'], app.config))
+
 if not app.debug:
-    file_handler = FileHandler('error.log')
-    file_handler.setFormatter(
-        Formatter('%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]')
-    )
     app.logger.setLevel(logging.INFO)
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
+    log_pipeline.add(app.logger, rotating_file_handler('error.log', app.config), logging.INFO)
+
+log_pipeline.start()
+if not app.debug:
     app.logger.info('errors')
 
 #----------------------------------------------------------------------------#
@@ -0,0 +1,53 @@
+#----------------------------------------------------------------------------#
+# Load benchmark harness (see `flask benchmark`).
+#----------------------------------------------------------------------------#
+# Drives requests through a Flask test client and reports throughput and
+# latency percentiles per target. A target is (name, method, url_factory,
+# data_factory); the factories take a random.Random so ids and search terms
+# vary between requests but are reproducible for a given seed.
+
+import random
+import time
+
+
+def percentile(sorted_values, fraction):
+  if not sorted_values:
+    return None
+  index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+  return sorted_values[index]
+
+
+def run_target(client, method, url_factory, data_factory, requests, rng, warmup=5):
+  for _ in range(warmup):
+    client.open(url_factory(rng), method=method, data=data_factory(rng) if data_factory else None)
+  timings, errors = [], 0
+  started = time.perf_counter()
+  for _ in range(requests):
+    url = url_factory(rng)
+    data = data_factory(rng) if data_factory else None
+    request_started = time.perf_counter()
+    response = client.open(url, method=method, data=data)
+    response.get_data()
+    timings.append(time.perf_counter() - request_started)
+    if response.status_code >= 400:
+      errors += 1
+  elapsed = time.perf_counter() - started
+  timings.sort()
+  ms = lambda seconds: round(seconds * 1000, 3) if seconds is not None else None
+  return {
+    "requests": requests,
+    "errors": errors,
+    "throughput_rps": round(requests / elapsed, 1) if elapsed else None,
+    "p50_ms": ms(percentile(timings, 0.50)),
+    "p90_ms": ms(percentile(timings, 0.90)),
+    "p99_ms": ms(percentile(timings, 0.99)),
+    "max_ms": ms(timings[-1] if timings else None),
+  }
+
+
+def run(client, targets, requests=200, seed=0):
+  rng = random.Random(seed)
+  report = {}
+  for name, method, url_factory, data_factory in targets:
+    report[name] = run_target(client, method, url_factory, data_factory, requests, rng)
+  return report
@@ -0,0 +1,313 @@
+#----------------------------------------------------------------------------#
+# Managed database layer.
+#----------------------------------------------------------------------------#
+# Engine options come from config (which reads them from the environment, see
+# config.py) and are applied per URL when Flask-SQLAlchemy creates an engine,
+# so SQLite test databases keep their own pools while server databases get a
+# sized QueuePool with pre-ping and recycling. PostgreSQL transactions begun
+# while serving a request get DB_STATEMENT_TIMEOUT_MS as a statement timeout;
+# CLI commands and other work outside a request run without one.
+# MeteredQueuePool counts checkouts, waits, timeouts and invalidations for the
+# /metrics endpoints.
+#
+# Read replicas are ordinary SQLALCHEMY_BINDS listed in READ_REPLICAS. Views
+# marked with `ReplicaRouter.read_only` pick one replica per request and
+# RoutingSession sends their queries there. Replicas lagging more than
+# REPLICA_MAX_LAG_SECONDS, or unreachable, are skipped (lag is probed at most
+# every REPLICA_LAG_CHECK_SECONDS); with none left the primary serves the
+# read. Any flush, DML statement or commit pins the rest of the request to
+# the primary, and the client's next REPLICA_PIN_SECONDS of requests too, so
+# a redirect after a form post reads its own write. Pages rendered from a
+# replica are not stored in the page cache and pinned clients do not read
+# from it.
+
+import random
+import re
+import threading
+import time
+from functools import wraps
+
+from flask import g, has_request_context, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import event, exc, orm, text
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.types import DateTime
+
+
+class db_now(FunctionElement):
+  # the database clock, for updated_at defaults: every writer stamps rows
+  # from the same clock as the migration backfill and COPY loads do
+  # (server_default now()), so max(updated_at) only moves forward
+  type = DateTime()
+  inherit_cache = True
+
+
+@compiles(db_now)
+def _compile_db_now(element, compiler, **kw):
+  return 'CURRENT_TIMESTAMP'
+
+
+@compiles(db_now, 'sqlite')
+def _compile_db_now_sqlite(element, compiler, **kw):
+  # CURRENT_TIMESTAMP only has whole seconds on SQLite; %f is milliseconds,
+  # padded to the microseconds SQLAlchemy's DateTime reads back
+  return "strftime('%Y-%m-%d %H:%M:%f000', 'now')"
+
+
+class MeteredQueuePool(QueuePool):
+  # QueuePool that records how long a checkout waited for a free connection.
+  # The wait happens inside _do_get, which has no event of its own.
+
+  def __init__(self, *args, **kwargs):
+    super().__init__(*args, **kwargs)
+    self.checkout_attempts = 0
+    self.timeouts = 0
+    self.invalidated = 0
+    self.wait_seconds = 0.0
+    self.max_wait_seconds = 0.0
+    self._metrics_lock = threading.Lock()
+    event.listen(self, 'invalidate', self._count_invalidated)
+
+  def _do_get(self):
+    started = time.perf_counter()
+    try:
+      return super()._do_get()
+    except exc.TimeoutError:
+      with self._metrics_lock:
+        self.timeouts += 1
+      raise
+    finally:
+      waited = time.perf_counter() - started
+      with self._metrics_lock:
+        self.checkout_attempts += 1
+        self.wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+  def _count_invalidated(self, dbapi_connection, connection_record, exception):
+    with self._metrics_lock:
+      self.invalidated += 1
+
+  def metrics(self):
+    with self._metrics_lock:
+      return {
+        "size": self.size(),
+        "checked_out": self.checkedout(),
+        "checked_in": self.checkedin(),
+        "overflow": max(self.overflow(), 0),
+        "checkout_attempts": self.checkout_attempts,
+        "timeouts": self.timeouts,
+        "invalidated": self.invalidated,
+        "wait_seconds_total": round(self.wait_seconds, 6),
+        "wait_seconds_max": round(self.max_wait_seconds, 6),
+      }
+
+
+def engine_options(url, config):
+  options = {"pool_pre_ping": config['DB_POOL_PRE_PING']}
+  if url.drivername.startswith('sqlite'):
+    # SQLite keeps the pool Flask-SQLAlchemy picks for it (static for
+    # :memory:, no pooling for files); sizing does not apply
+    return options
+  options.update({
+    "poolclass": MeteredQueuePool,
+    "pool_size": config['DB_POOL_SIZE'],
+    "max_overflow": config['DB_MAX_OVERFLOW'],
+    "pool_timeout": config['DB_POOL_TIMEOUT'],
+    "pool_recycle": config['DB_POOL_RECYCLE'],
+  })
+  return options
+
+
+# seconds the replica is behind; 0 when it has replayed everything it has
+# received, so an idle primary does not look like lag
+PG_REPLICA_LAG = '''
+  SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+  END
+'''
+
+
+class ReplicaRouter(object):
+
+  def __init__(self, app=None, db=None):
+    self.app = None
+    self.db = db
+    self._lag = {}
+    self._reads = {}
+    self.fallbacks = 0
+    self.pinned = 0
+    self._lock = threading.Lock()
+    if app is not None:
+      self.init_app(app, db)
+
+  def init_app(self, app, db=None):
+    self.app = app
+    self.db = db or self.db
+    app.extensions['replicas'] = self
+    app.before_request(self._start_request)
+    app.after_request(self._pin_client)
+    event.listen(orm.Session, 'after_commit', self._committed)
+
+  @property
+  def names(self):
+    return list(self.app.config['READ_REPLICAS'])
+
+  def measure_lag(self, engine):
+    # seconds behind the primary, None when the replica cannot be reached.
+    # Only PostgreSQL reports lag; other databases count as caught up.
+    try:
+      with engine.connect() as connection:
+        if engine.dialect.name == 'postgresql':
+          return float(connection.execute(text(PG_REPLICA_LAG)).scalar() or 0)
+        connection.execute(text('SELECT 1'))
+        return 0.0
+    except exc.DBAPIError:
+      return None
+
+  def lag(self, name, now=None):
+    now = now or time.monotonic()
+    with self._lock:
+      checked = self._lag.get(name)
+    if checked is not None and now - checked[0] < self.app.config['REPLICA_LAG_CHECK_SECONDS']:
+      return checked[1]
+    lag = self.measure_lag(self.db.get_engine(self.app, bind=name))
+    with self._lock:
+      self._lag[name] = (now, lag)
+    return lag
+
+  def choose(self):
+    # a replica that is up and close enough, or None for the primary
+    max_lag = self.app.config['REPLICA_MAX_LAG_SECONDS']
+    healthy = []
+    for name in self.names:
+      lag = self.lag(name)
+      if lag is not None and lag <= max_lag:
+        healthy.append(name)
+    if not healthy:
+      if self.names:
+        with self._lock:
+          self.fallbacks += 1
+      return None
+    name = random.choice(healthy)
+    with self._lock:
+      self._reads[name] = self._reads.get(name, 0) + 1
+    return name
+
+  def client_pinned(self):
+    return session.get('primary_until', 0) > time.time()
+
+  def read_only(self, view):
+    # marks a view whose queries may be served by a replica. A page rendered
+    # from a replica may predate a write that already bumped the page cache
+    # versions, so it is not stored; a pinned client skips the cache too, so
+    # it reads its own write.
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+      pinned = bool(self.names) and self.client_pinned()
+      g.read_replica = self.choose() if self.names and not pinned else None
+      g.page_cache_bypass = pinned
+      g.page_cache_no_store = g.read_replica is not None
+      return view(*args, **kwargs)
+    return wrapper
+
+  def pin(self):
+    g.read_replica = None
+    g.primary_written = True
+
+  def engine_for(self, db_session, clause=None):
+    # the replica engine for this statement, or None for the default bind
+    if not has_request_context():
+      return None
+    if db_session._flushing or getattr(clause, 'is_dml', False):
+      self.pin()
+      return None
+    name = g.get('read_replica')
+    if name is None:
+      return None
+    return self.db.get_engine(self.app, bind=name)
+
+  def _start_request(self):
+    # g outlives the request when an app context is reused (tests, CLI)
+    g.read_replica = None
+    g.primary_written = False
+    g.page_cache_bypass = g.page_cache_no_store = False
+
+  def _committed(self, db_session):
+    if has_request_context():
+      self.pin()
+
+  def _pin_client(self, response):
+    if g.get('primary_written') and self.names:
+      session['primary_until'] = time.time() + self.app.config['REPLICA_PIN_SECONDS']
+      with self._lock:
+        self.pinned += 1
+    return response
+
+  def metrics(self):
+    with self._lock:
+      lag = dict(self._lag)
+      return {
+        "replicas": {name: {
+          "available": name in lag and lag[name][1] is not None,
+          "lag_seconds": lag[name][1] if name in lag else None,
+          "reads": self._reads.get(name, 0),
+        } for name in self.names},
+        "primary_fallbacks": self.fallbacks,
+        "clients_pinned": self.pinned,
+      }
+
+
+class RoutingSession(SignallingSession):
+
+  def get_bind(self, mapper=None, clause=None, **kwargs):
+    router = self.app.extensions.get('replicas')
+    engine = router.engine_for(self, clause) if router is not None else None
+    if engine is not None:
+      return engine
+    return super().get_bind(mapper, clause)
+
+
+@event.listens_for(RoutingSession, 'after_begin')
+def request_statement_timeout(db_session, transaction, connection):
+  # SET LOCAL lasts until the transaction ends, so the pooled connection
+  # goes back without it
+  timeout = int(db_session.app.config['DB_STATEMENT_TIMEOUT_MS'])
+  if timeout and has_request_context() and connection.dialect.name == 'postgresql':
+    connection.execute(text(f'SET LOCAL statement_timeout = {timeout}'))
+
+
+class ManagedSQLAlchemy(SQLAlchemy):
+
+  def create_session(self, options):
+    return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+  def apply_driver_hacks(self, app, sa_url, options):
+    sa_url, options = super().apply_driver_hacks(app, sa_url, options)
+    options.update(engine_options(sa_url, app.config))
+    return sa_url, options
+
+
+def pool_metrics(engine):
+  pool = engine.pool
+  metrics = {"pool": type(pool).__name__}
+  if isinstance(pool, MeteredQueuePool):
+    metrics.update(pool.metrics())
+  return metrics
+
+
+def prometheus_text(metrics, prefix='fyyur'):
+  # flattens nested dicts of numbers into Prometheus exposition lines;
+  # strings and None are skipped
+  lines = []
+  def walk(name, value):
+    if isinstance(value, dict):
+      for key, child in sorted(value.items()):
+        walk(f'{name}_{key}', child)
+    elif isinstance(value, (bool, int, float)):
+      lines.append(f'{re.sub(r"[^a-zA-Z0-9_]", "_", name)} {int(value) if isinstance(value, bool) else value}')
+  walk(prefix, metrics)
+  return '\n'.join(lines) + '\n'
@@ -0,0 +1,186 @@
+#----------------------------------------------------------------------------#
+# Bitmap facet index for browsing artists and venues.
+#----------------------------------------------------------------------------#
+# One bitset per genre, per state and for the seeking flag, over entity ids:
+# bit n is set when entity n has that genre/state/flag. Python ints are the
+# bitsets, so filters are `&`/`|` over whole sets and a facet count is the
+# popcount of an intersection. Writes only mark ids stale; the caller
+# refreshes them from the database before the next query (see app.py).
+
+import threading
+from collections import defaultdict
+
+
+def popcount(bits):
+  return bin(bits).count('1')
+
+
+def iter_ids(bits):
+  # ids of the set bits, ascending
+  while bits:
+    low = bits & -bits
+    yield low.bit_length() - 1
+    bits ^= low
+
+
+def bits_from_ids(ids):
+  # one bitset from a list of ids in linear time; or-ing the bits in one by
+  # one would copy the growing int for every id
+  if not ids:
+    return 0
+  buffer = bytearray(max(ids) // 8 + 1)
+  for entity_id in ids:
+    buffer[entity_id >> 3] |= 1 << (entity_id & 7)
+  return int.from_bytes(buffer, 'little')
+
+
+class FacetSet(object):
+  # the bitsets of one entity kind
+
+  def __init__(self):
+    self.all = 0
+    self.seeking = 0
+    self.genres = {}
+    self.states = {}
+    self.entries = {}
+
+  @classmethod
+  def from_entries(cls, entries):
+    # entries: (id, state, seeking, genre_ids), one per entity. Ids are
+    # collected per facet first and each bitset is built once.
+    facet_set = cls()
+    all_ids, seeking_ids = [], []
+    genres, states = defaultdict(list), defaultdict(list)
+    for entity_id, state, seeking, genre_ids in entries:
+      all_ids.append(entity_id)
+      if seeking:
+        seeking_ids.append(entity_id)
+      if state is not None:
+        states[state].append(entity_id)
+      for genre_id in genre_ids:
+        genres[genre_id].append(entity_id)
+      facet_set.entries[entity_id] = (state, bool(seeking), tuple(genre_ids))
+    facet_set.all = bits_from_ids(all_ids)
+    facet_set.seeking = bits_from_ids(seeking_ids)
+    facet_set.genres = {genre_id: bits_from_ids(ids) for genre_id, ids in genres.items()}
+    facet_set.states = {state: bits_from_ids(ids) for state, ids in states.items()}
+    return facet_set
+
+  def set(self, entity_id, state, seeking, genre_ids):
+    self.remove(entity_id)
+    bit = 1 << entity_id
+    self.all |= bit
+    if seeking:
+      self.seeking |= bit
+    if state is not None:
+      self.states[state] = self.states.get(state, 0) | bit
+    for genre_id in genre_ids:
+      self.genres[genre_id] = self.genres.get(genre_id, 0) | bit
+    self.entries[entity_id] = (state, bool(seeking), tuple(genre_ids))
+
+  def remove(self, entity_id):
+    entry = self.entries.pop(entity_id, None)
+    if entry is None:
+      return
+    state, seeking, genre_ids = entry
+    mask = ~(1 << entity_id)
+    self.all &= mask
+    self.seeking &= mask
+    if state is not None:
+      self.states[state] &= mask
+    for genre_id in genre_ids:
+      self.genres[genre_id] &= mask
+
+  def union(self, bitsets, ids):
+    bits = 0
+    for value in ids:
+      bits |= bitsets.get(value, 0)
+    return bits
+
+  def select(self, genres=(), states=(), seeking=None, match_all=False):
+    # genres: any of them (or all of them with match_all); states: any of
+    # them; seeking: True/False/None. Returns the bitset of every facet
+    # filter on its own plus the combined result, for disjunctive counts.
+    if not genres:
+      genre_bits = self.all
+    elif match_all:
+      genre_bits = self.all
+      for genre_id in genres:
+        genre_bits &= self.genres.get(genre_id, 0)
+    else:
+      genre_bits = self.union(self.genres, genres)
+    state_bits = self.union(self.states, states) if states else self.all
+    if seeking is None:
+      seeking_bits = self.all
+    else:
+      seeking_bits = self.seeking if seeking else self.all & ~self.seeking
+    return genre_bits, state_bits, seeking_bits
+
+  def counts(self, genre_bits, state_bits, seeking_bits):
+    # each facet is counted against the other facets' filters, so picking
+    # one more genre shows how many results it would add
+    without_genres = state_bits & seeking_bits
+    without_states = genre_bits & seeking_bits
+    return {
+      "genres": {genre_id: popcount(bits & without_genres) for genre_id, bits in self.genres.items()
+        if bits & without_genres},
+      "states": {state: popcount(bits & without_states) for state, bits in self.states.items()
+        if bits & without_states},
+      "seeking": popcount(self.seeking & genre_bits & state_bits),
+    }
+
+
+class FacetIndex(object):
+
+  def __init__(self, kinds=('artist', 'venue')):
+    self.kinds = kinds
+    self.loaded = False
+    self.stale = set()
+    self._sets = {kind: FacetSet() for kind in kinds}
+    self._lock = threading.Lock()
+
+  def build(self, entries):
+    # entries: iterable of (kind, id, state, seeking, genre_ids)
+    grouped = {kind: [] for kind in self.kinds}
+    for kind, entity_id, state, seeking, genre_ids in entries:
+      grouped[kind].append((entity_id, state, seeking, genre_ids))
+    sets = {kind: FacetSet.from_entries(rows) for kind, rows in grouped.items()}
+    with self._lock:
+      self._sets = sets
+      self.stale = set()
+      self.loaded = True
+
+  def invalidate(self, pairs):
+    # pairs: (kind, id) written by a committed transaction
+    with self._lock:
+      self.stale.update(pairs)
+
+  def take_stale(self):
+    with self._lock:
+      stale, self.stale = self.stale, set()
+    return stale
+
+  def refresh(self, kind, entries, removed):
+    # entries: (id, state, seeking, genre_ids) as now stored; removed: ids
+    # that no longer exist (or should not be browsable)
+    with self._lock:
+      facet_set = self._sets[kind]
+      for entity_id in removed:
+        facet_set.remove(entity_id)
+      for entity_id, state, seeking, genre_ids in entries:
+        facet_set.set(entity_id, state, seeking, genre_ids)
+
+  def search(self, kind, genres=(), states=(), seeking=None, match_all=False, offset=0, limit=50):
+    # (total, page of ids, facet counts)
+    with self._lock:
+      facet_set = self._sets[kind]
+      genre_bits, state_bits, seeking_bits = facet_set.select(genres, states, seeking, match_all)
+      bits = genre_bits & state_bits & seeking_bits
+      counts = facet_set.counts(genre_bits, state_bits, seeking_bits)
+    page = []
+    for i, entity_id in enumerate(iter_ids(bits)):
+      if i >= offset + limit:
+        break
+      if i >= offset:
+        page.append(entity_id)
+    return popcount(bits), page, counts
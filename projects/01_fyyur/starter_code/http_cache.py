@@ -0,0 +1,52 @@
+#----------------------------------------------------------------------------#
+# Conditional GET.
+#----------------------------------------------------------------------------#
+# A view decorated with `conditional(signature)` gets a weak ETag derived from
+# `signature(**view_args)`, a small tuple of values read with one indexed
+# query (row counts, max(updated_at), ...). When the client's If-None-Match
+# already holds that ETag the view is never called and a bodyless 304 goes
+# out. Responses carry `Cache-Control: no-cache` so browsers and the CDN keep
+# the copy but revalidate it on every use.
+#
+# The ETag is also left in `g.page_etag` for page_cache, which keys stored
+# pages by it: a cached body is only served under the signature it was
+# rendered with, even when another worker made the write and this process's
+# cache versions never moved.
+#
+# No Last-Modified is sent: deletes and shows sliding from upcoming to past
+# change a page without moving any updated_at, so a date alone could answer
+# 304 for a page that did change. The signatures include counts for that.
+
+import hashlib
+from functools import wraps
+
+from flask import current_app, g, make_response, request, session
+
+
+def etag_for(parts):
+  return hashlib.sha1(repr(tuple(parts)).encode()).hexdigest()[:20]
+
+
+def conditional(signature):
+  def decorator(view):
+    @wraps(view)
+    def wrapper(**view_args):
+      # pending flash messages are rendered into the page by the layout
+      if (not current_app.config['CONDITIONAL_GET'] or request.method not in ('GET', 'HEAD')
+          or session.get('_flashes')):
+        return view(**view_args)
+      parts = signature(**view_args)
+      if parts is None:
+        # e.g. an unknown id; let the view answer (usually with a 404)
+        return view(**view_args)
+      etag = etag_for((view.__name__, request.query_string) + tuple(parts))
+      g.page_etag = etag
+      if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+      else:
+        response = make_response(view(**view_args))
+      response.set_etag(etag, weak=True)
+      response.cache_control.no_cache = True
+      return response
+    return wrapper
+  return decorator
@@ -0,0 +1,46 @@
+#----------------------------------------------------------------------------#
+# Onboarding imports: reading artist and venue files.
+#----------------------------------------------------------------------------#
+# Records come from a JSON file (a list, or {"artists": [...]} /
+# {"venues": [...]}) or a CSV file whose header names the columns. In CSV
+# the `genres` cell holds several names separated by `;`. Values are passed
+# on as strings; app.create_owners() validates and resolves them. Nothing here
+# touches the database.
+
+import csv
+import json
+
+
+class ImportFormatError(ValueError):
+  pass
+
+
+def split_genres(value):
+  if value is None:
+    return []
+  if isinstance(value, str):
+    value = value.split(';')
+  elif not isinstance(value, list):
+    value = [value]
+  # non-string names are kept so they fail as unknown genres on their row
+  return [str(name).strip() for name in value if name is not None and str(name).strip()]
+
+
+def read_records(stream, filename, kind):
+  # `kind` is 'artists' or 'venues', the key looked up in a JSON object
+  if filename.lower().endswith('.json'):
+    payload = json.load(stream)
+    if isinstance(payload, dict):
+      payload = payload.get(kind)
+    if not isinstance(payload, list) or not all(isinstance(row, dict) for row in payload):
+      raise ImportFormatError(f'expected a list of objects or {{"{kind}": [...]}}')
+    records = payload
+  else:
+    reader = csv.DictReader(stream)
+    missing = {'name', 'city', 'state'} - set(reader.fieldnames or ())
+    if missing:
+      raise ImportFormatError('missing CSV columns: ' + ', '.join(sorted(missing)))
+    records = list(reader)
+  for record in records:
+    record['genres'] = split_genres(record.get('genres'))
+  return records
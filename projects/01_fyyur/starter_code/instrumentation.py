@@ -0,0 +1,109 @@
+#----------------------------------------------------------------------------#
+# Per-request SQL instrumentation.
+#----------------------------------------------------------------------------#
+# Hooks every SQLAlchemy engine to count statements and time spent in the
+# database for the current request. On the way out it adds a Server-Timing
+# header, warns when one statement shape repeats often enough to look like an
+# N+1, and logs statements slower than SLOW_QUERY_MS to the `fyyur.sql`
+# logger with structured fields. Queries run while a streamed body is being generated
+# happen after the headers are sent, so they are only visible in the slow log.
+
+import logging
+import re
+import time
+from collections import Counter
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger('fyyur.sql')
+
+_placeholder_lists = re.compile(r'\((?:\s*(?:\?|%\(\w+\)s|%s|:\w+)\s*,)+\s*(?:\?|%\(\w+\)s|%s|:\w+)\s*\)')
+_whitespace = re.compile(r'\s+')
+
+
+def statement_shape(statement):
+  # collapse whitespace and IN (...) lists of any length to one placeholder
+  return _placeholder_lists.sub('(?)', _whitespace.sub(' ', statement).strip())
+
+
+class RequestStats(object):
+
+  def __init__(self):
+    self.started = time.perf_counter()
+    self.queries = 0
+    self.seconds = 0.0
+    self.shapes = Counter()
+
+  def record(self, statement, seconds):
+    self.queries += 1
+    self.seconds += seconds
+    self.shapes[statement_shape(statement)] += 1
+
+  def repeated(self, threshold):
+    return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+class SQLInstrumentation(object):
+
+  def __init__(self, app=None):
+    self.app = None
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    self.app = app
+    if not app.config.get('SQL_INSTRUMENTATION', True):
+      return
+    event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+    event.listen(Engine, 'handle_error', self._handle_error)
+    app.before_request(self._start_request)
+    app.after_request(self._finish_request)
+
+  def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+  def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info['query_started'].pop()
+    in_request = has_request_context()
+    stats = g.get('sql_stats') if in_request else None
+    if stats is not None:
+      stats.record(statement, seconds)
+    if seconds * 1000 >= self.app.config['SLOW_QUERY_MS']:
+      logger.warning('slow query', extra={"fields": {
+        "event": "slow_query",
+        "ms": round(seconds * 1000, 2),
+        "statement": statement_shape(statement),
+        "executemany": executemany,
+        "method": request.method if in_request else None,
+        "url_path": request.path if in_request else None,
+      }})
+
+  def _handle_error(self, context):
+    started = context.connection.info.get('query_started') if context.connection else None
+    if started:
+      started.pop()
+
+  def _start_request(self):
+    g.sql_stats = RequestStats()
+
+  def _finish_request(self, response):
+    stats = g.pop('sql_stats', None)
+    if stats is None:
+      return response
+    total_ms = (time.perf_counter() - stats.started) * 1000
+    db_ms = stats.seconds * 1000
+    if self.app.config['SQL_SERVER_TIMING']:
+      response.headers.add('Server-Timing',
+        f'db;dur={db_ms:.2f};desc="{stats.queries} queries", app;dur={total_ms:.2f}')
+    for shape, count in stats.repeated(self.app.config['N_PLUS_ONE_THRESHOLD']):
+      logger.warning('repeated query', extra={"fields": {
+        "event": "repeated_query",
+        "count": count,
+        "statement": shape,
+        "method": request.method,
+        "url_path": request.path,
+      }})
+    return response
@@ -0,0 +1,116 @@
+#----------------------------------------------------------------------------#
+# Queued logging.
+#----------------------------------------------------------------------------#
+# Request threads only put records on a bounded in-memory queue; a
+# QueueListener thread per destination formats them as JSON lines and writes
+# them to a size- or time-rotated file. When a queue is full the record is
+# dropped and counted instead of blocking the request; the count is reported
+# in the log as soon as there is room again.
+
+import atexit
+import copy
+import json
+import logging
+import queue
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+
+
+class JSONFormatter(logging.Formatter):
+  # one JSON object per line; `extra={'fields': {...}}` is merged in
+
+  def format(self, record):
+    entry = {
+      "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+      "level": record.levelname,
+      "logger": record.name,
+      "message": record.getMessage(),
+      "path": f'{record.pathname}:{record.lineno}',
+    }
+    entry.update(getattr(record, 'fields', None) or {})
+    # records from the queue carry the traceback already formatted
+    exc = self.formatException(record.exc_info) if record.exc_info else record.exc_text
+    if exc:
+      entry["exc"] = exc
+    return json.dumps(entry, default=str)
+
+
+_traceback_formatter = logging.Formatter()
+
+
+class DroppingQueueHandler(QueueHandler):
+
+  def __init__(self, maxsize):
+    super().__init__(queue.Queue(maxsize))
+    self.dropped = 0
+    self._unreported = 0
+
+  def prepare(self, record):
+    # QueueHandler.prepare folds the traceback into msg; keep it in exc_text
+    # so JSONFormatter writes it as its own field
+    record = copy.copy(record)
+    if record.exc_info and not record.exc_text:
+      record.exc_text = _traceback_formatter.formatException(record.exc_info)
+    record.msg = record.getMessage()
+    record.args = None
+    record.exc_info = None
+    return record
+
+  def enqueue(self, record):
+    try:
+      if self._unreported:
+        self.queue.put_nowait(self._drop_notice())
+        self._unreported = 0
+      self.queue.put_nowait(record)
+    except queue.Full:
+      self.dropped += 1
+      self._unreported += 1
+
+  def _drop_notice(self):
+    return logging.LogRecord('fyyur.logging', logging.WARNING, __file__, 0,
+      'log queue full, dropped %d records', (self._unreported,), None)
+
+
+def rotating_file_handler(filename, config):
+  if config['LOG_ROTATION'] == 'time':
+    handler = TimedRotatingFileHandler(filename, when=config['LOG_ROTATE_WHEN'],
+      backupCount=config['LOG_BACKUP_COUNT'], delay=True)
+  else:
+    handler = RotatingFileHandler(filename, maxBytes=config['LOG_MAX_BYTES'],
+      backupCount=config['LOG_BACKUP_COUNT'], delay=True)
+  handler.setFormatter(JSONFormatter())
+  return handler
+
+
+class QueuedLogging(object):
+
+  def __init__(self, maxsize):
+    self.maxsize = maxsize
+    self.handlers = {}
+    self.listeners = []
+    self.running = False
+
+  def add(self, logger, handler, level=logging.NOTSET):
+    queue_handler = DroppingQueueHandler(self.maxsize)
+    queue_handler.setLevel(level)
+    logger.addHandler(queue_handler)
+    self.handlers[logger.name] = queue_handler
+    self.listeners.append(QueueListener(queue_handler.queue, handler, respect_handler_level=True))
+    return queue_handler
+
+  def start(self):
+    for listener in self.listeners:
+      listener.start()
+    self.running = True
+    atexit.register(self.stop)
+
+  def stop(self):
+    # flushes whatever is still queued
+    if self.running:
+      for listener in self.listeners:
+        listener.stop()
+      self.running = False
+
+  @property
+  def dropped(self):
+    return {name: handler.dropped for name, handler in self.handlers.items()}
@@ -0,0 +1,26 @@
+"""version columns on Venue and Artist for optimistic locking
+
+Revision ID: 0b6d2e8f4a13
+Revises: f1a9c3d5e7b2
+Create Date: 2021-02-18 14:22:51.603117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b6d2e8f4a13'
+down_revision = 'f1a9c3d5e7b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('Venue', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+    op.add_column('Artist', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade():
+    op.drop_column('Artist', 'version')
+    op.drop_column('Venue', 'version')
@@ -0,0 +1,24 @@
+"""archived_at on Venue for soft deletion
+
+Revision ID: 7c3e5a9b1d24
+Revises: 0b6d2e8f4a13
+Create Date: 2021-02-20 16:05:38.118492
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c3e5a9b1d24'
+down_revision = '0b6d2e8f4a13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('Venue', sa.Column('archived_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('Venue', 'archived_at')
@@ -0,0 +1,26 @@
+"""composite indexes for show booking conflict checks
+
+Revision ID: 9d2a6e13c5b8
+Revises: c83e4a1f0b27
+Create Date: 2021-02-09 16:41:05.277310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d2a6e13c5b8'
+down_revision = 'c83e4a1f0b27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_Show_venue_id_start_time', 'Show', ['venue_id', 'start_time'], unique=False)
+    op.create_index('ix_Show_artist_id_start_time', 'Show', ['artist_id', 'start_time'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Show_artist_id_start_time', table_name='Show')
+    op.drop_index('ix_Show_venue_id_start_time', table_name='Show')
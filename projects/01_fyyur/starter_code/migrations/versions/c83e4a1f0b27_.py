@@ -0,0 +1,36 @@
+"""materialized upcoming show counters on Venue and Artist
+
+Revision ID: c83e4a1f0b27
+Revises: 5f1c2b7d9e40
+Create Date: 2021-02-05 11:02:47.905131
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c83e4a1f0b27'
+down_revision = '5f1c2b7d9e40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('Venue', sa.Column('upcoming_shows_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('Artist', sa.Column('upcoming_shows_count', sa.Integer(), nullable=False, server_default='0'))
+
+    # backfill from the existing shows
+    show = sa.table('Show', sa.column('id'), sa.column('venue_id'),
+        sa.column('artist_id'), sa.column('start_time'))
+    for name, owner_column in (('Venue', show.c.venue_id), ('Artist', show.c.artist_id)):
+        owner = sa.table(name, sa.column('id'), sa.column('upcoming_shows_count'))
+        upcoming = sa.select([sa.func.count(show.c.id)]).where(sa.and_(
+            owner_column == owner.c.id, show.c.start_time > sa.func.current_timestamp()
+        )).scalar_subquery()
+        op.execute(owner.update().values(upcoming_shows_count=upcoming))
+
+
+def downgrade():
+    op.drop_column('Artist', 'upcoming_shows_count')
+    op.drop_column('Venue', 'upcoming_shows_count')
@@ -0,0 +1,35 @@
+"""secondary indexes for listing, detail and genre lookups
+
+Revision ID: e4b07c9a2f61
+Revises: 9d2a6e13c5b8
+Create Date: 2021-02-12 10:17:33.640281
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b07c9a2f61'
+down_revision = '9d2a6e13c5b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Show.venue_id / Show.artist_id lookups are covered by the
+    # (venue_id, start_time) and (artist_id, start_time) indexes of 9d2a6e13c5b8
+    op.create_index('ix_Show_start_time', 'Show', ['start_time'], unique=False)
+    op.create_index('ix_Venue_state_city', 'Venue', ['state', 'city'], unique=False)
+    op.create_index('ix_Artist_state', 'Artist', ['state'], unique=False)
+    # the primary keys lead with genre_id; these serve "genres of venue/artist"
+    op.create_index('ix_venueGenres_venue_id_genre_id', 'venueGenres', ['venue_id', 'genre_id'], unique=False)
+    op.create_index('ix_artistGenres_artist_id_genre_id', 'artistGenres', ['artist_id', 'genre_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_artistGenres_artist_id_genre_id', table_name='artistGenres')
+    op.drop_index('ix_venueGenres_venue_id_genre_id', table_name='venueGenres')
+    op.drop_index('ix_Artist_state', table_name='Artist')
+    op.drop_index('ix_Venue_state_city', table_name='Venue')
+    op.drop_index('ix_Show_start_time', table_name='Show')
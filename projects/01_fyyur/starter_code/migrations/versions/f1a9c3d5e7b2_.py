@@ -0,0 +1,33 @@
+"""updated_at columns on Venue, Artist and Show for conditional GET
+
+Revision ID: f1a9c3d5e7b2
+Revises: e4b07c9a2f61
+Create Date: 2021-02-16 09:41:05.227913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1a9c3d5e7b2'
+down_revision = 'e4b07c9a2f61'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Venue', 'Artist', 'Show')
+
+
+def upgrade():
+    # existing rows are stamped with the migration time; max(updated_at) is
+    # read through the index on every conditional GET
+    for table in TABLES:
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=False,
+            server_default=sa.func.now()))
+        op.create_index(f'ix_{table}_updated_at', table, ['updated_at'], unique=False)
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        op.drop_index(f'ix_{table}_updated_at', table_name=table)
+        op.drop_column(table, 'updated_at')
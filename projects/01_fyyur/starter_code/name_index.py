@@ -0,0 +1,144 @@
+#----------------------------------------------------------------------------#
+# In-memory name index for search-as-you-type.
+#----------------------------------------------------------------------------#
+
+import bisect
+import random
+import string
+import threading
+import time
+import unicodedata
+
+
+def normalize(name):
+  # case and accent insensitive form used for both keys and queries
+  name = unicodedata.normalize('NFKD', name or '')
+  name = ''.join(c for c in name if not unicodedata.combining(c))
+  return ' '.join(name.casefold().split())
+
+
+class NameIndex(object):
+  # A sorted array of (key, kind, id) tuples. Every name is stored once per
+  # word, keyed by the name from that word onwards, so a prefix lookup with
+  # bisect also finds matches that start mid-name ("hop" -> "The Musical Hop").
+  # The number of keys is capped by max_entries; names that would go over the
+  # budget are not indexed and counted in `dropped`.
+
+  def __init__(self, max_entries=500000):
+    self.max_entries = max_entries
+    self.loaded = False
+    self.dropped = 0
+    self._keys = []
+    self._names = {}
+    self._lock = threading.Lock()
+
+  def __len__(self):
+    return len(self._keys)
+
+  @staticmethod
+  def _word_keys(name):
+    words = normalize(name).split(' ')
+    return [' '.join(words[i:]) for i in range(len(words)) if words[i]]
+
+  def build(self, entries):
+    # entries: iterable of (kind, id, name). Sorts once instead of inserting.
+    keys, names, dropped = [], {}, 0
+    for kind, entity_id, name in entries:
+      word_keys = self._word_keys(name)
+      if len(keys) + len(word_keys) > self.max_entries:
+        dropped += 1
+        continue
+      names[(kind, entity_id)] = (name, word_keys)
+      keys.extend((key, kind, entity_id) for key in word_keys)
+    keys.sort()
+    with self._lock:
+      self._keys, self._names, self.dropped = keys, names, dropped
+      self.loaded = True
+
+  def add(self, kind, entity_id, name):
+    with self._lock:
+      self._remove(kind, entity_id)
+      word_keys = self._word_keys(name)
+      if len(self._keys) + len(word_keys) > self.max_entries:
+        self.dropped += 1
+        return False
+      self._names[(kind, entity_id)] = (name, word_keys)
+      for key in word_keys:
+        bisect.insort(self._keys, (key, kind, entity_id))
+      return True
+
+  def remove(self, kind, entity_id):
+    with self._lock:
+      self._remove(kind, entity_id)
+
+  def _remove(self, kind, entity_id):
+    entry = self._names.pop((kind, entity_id), None)
+    if entry is None:
+      return
+    for key in entry[1]:
+      i = bisect.bisect_left(self._keys, (key, kind, entity_id))
+      if i < len(self._keys) and self._keys[i] == (key, kind, entity_id):
+        del self._keys[i]
+
+  def search(self, prefix, limit=10, kind=None):
+    prefix = normalize(prefix)
+    if not prefix:
+      return []
+    results, seen = [], set()
+    with self._lock:
+      i = bisect.bisect_left(self._keys, (prefix,))
+      while i < len(self._keys) and len(results) < limit:
+        key, entry_kind, entity_id = self._keys[i]
+        if not key.startswith(prefix):
+          break
+        i += 1
+        if (kind is not None and entry_kind != kind) or (entry_kind, entity_id) in seen:
+          continue
+        seen.add((entry_kind, entity_id))
+        results.append({
+          "id": entity_id,
+          "name": self._names[(entry_kind, entity_id)][0],
+          "type": entry_kind,
+        })
+    return results
+
+
+#----------------------------------------------------------------------------#
+# Benchmark: python name_index.py
+#----------------------------------------------------------------------------#
+
+def _random_name(rng):
+  words = rng.randint(1, 4)
+  return ' '.join(
+    ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9))).title()
+    for _ in range(words))
+
+def benchmark(sizes=(1000, 10000, 100000, 500000), queries=2000, seed=0):
+  rng = random.Random(seed)
+  report = []
+  for size in sizes:
+    names = [_random_name(rng) for _ in range(size)]
+    index = NameIndex(max_entries=size * 4)
+    started = time.perf_counter()
+    index.build(('artist', i, name) for i, name in enumerate(names))
+    build_s = time.perf_counter() - started
+    prefixes = [normalize(rng.choice(names))[:rng.randint(1, 5)] for _ in range(queries)]
+    timings = []
+    for prefix in prefixes:
+      started = time.perf_counter()
+      index.search(prefix)
+      timings.append(time.perf_counter() - started)
+    timings.sort()
+    report.append({
+      "names": size,
+      "keys": len(index),
+      "build_ms": round(build_s * 1000, 1),
+      "p50_us": round(timings[len(timings) // 2] * 1e6, 1),
+      "p99_us": round(timings[int(len(timings) * 0.99)] * 1e6, 1),
+    })
+  return report
+
+if __name__ == '__main__':
+  import json
+  for row in benchmark():
+    print(json.dumps(row))
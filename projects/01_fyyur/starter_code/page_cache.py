@@ -0,0 +1,117 @@
+#----------------------------------------------------------------------------#
+# Page cache with version-based invalidation.
+#----------------------------------------------------------------------------#
+# Rendered pages are stored under their view key plus the current value of
+# every version counter they depend on ('Venue' for the venue table,
+# 'Venue:3' for one venue, ...). Writes bump counters instead of deleting
+# entries, so a stale page simply stops being addressable and ages out of the
+# LRU. The backend is pluggable: anything with get/set/incr/version works,
+# e.g. a shared store when several processes serve the app.
+
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, g, request, session
+
+
+class LRUBackend(object):
+  # in-process LRU with per-entry TTL. Version counters live in a separate
+  # dict that is never evicted, otherwise a reset counter could resurrect an
+  # old entry.
+
+  def __init__(self, maxsize=1024, ttl=60):
+    self.maxsize = maxsize
+    self.ttl = ttl
+    self._entries = OrderedDict()
+    self._versions = {}
+    self._lock = threading.Lock()
+
+  def get(self, key):
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is None:
+        return None
+      value, expires = entry
+      if expires < time.monotonic():
+        del self._entries[key]
+        return None
+      self._entries.move_to_end(key)
+      return value
+
+  def set(self, key, value, ttl=None):
+    expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+    with self._lock:
+      self._entries[key] = (value, expires)
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.maxsize:
+        self._entries.popitem(last=False)
+
+  def version(self, name):
+    return self._versions.get(name, 0)
+
+  def incr(self, name):
+    with self._lock:
+      self._versions[name] = self._versions.get(name, 0) + 1
+
+  def __len__(self):
+    return len(self._entries)
+
+
+class PageCache(object):
+
+  def __init__(self, backend=None):
+    self.backend = backend or LRUBackend()
+    self.hits = 0
+    self.misses = 0
+    self.bypassed = 0
+
+  def versions(self, names):
+    return tuple(self.backend.version(name) for name in names)
+
+  def bump(self, names):
+    for name in names:
+      self.backend.incr(name)
+
+  def cached(self, key, depends):
+    # key(**view_args) -> hashable; depends(**view_args) -> version names.
+    # Only GET responses rendered to a string are stored, and pages are not
+    # served from or written to the cache while a flash message is pending
+    # because the layout renders it into the page. A request can also opt
+    # out with g.page_cache_bypass (neither read nor store) or
+    # g.page_cache_no_store (read only); see database.ReplicaRouter.
+    def decorator(view):
+      @wraps(view)
+      def wrapper(**view_args):
+        if (not current_app.config['PAGE_CACHE'] or request.method != 'GET'
+            or session.get('_flashes') or g.get('page_cache_bypass')):
+          self.bypassed += 1
+          return view(**view_args)
+        names = depends(**view_args)
+        # view_args are part of the key: two venues at the same versions
+        # must not share a page. So is the ETag set by http_cache.conditional,
+        # so a page goes out only under the signature it was rendered with.
+        cache_key = (view.__name__, tuple(sorted(view_args.items())), key(**view_args),
+          self.versions(names), g.get('page_etag'))
+        page = self.backend.get(cache_key)
+        if page is not None:
+          self.hits += 1
+          return page
+        self.misses += 1
+        page = view(**view_args)
+        if isinstance(page, str) and not session.get('_flashes') and not g.get('page_cache_no_store'):
+          self.backend.set(cache_key, page)
+        return page
+      return wrapper
+    return decorator
+
+  def stats(self):
+    lookups = self.hits + self.misses
+    return {
+      "hits": self.hits,
+      "misses": self.misses,
+      "bypassed": self.bypassed,
+      "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+      "entries": len(self.backend) if hasattr(self.backend, '__len__') else None,
+    }
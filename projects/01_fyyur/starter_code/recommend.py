@@ -0,0 +1,167 @@
+#----------------------------------------------------------------------------#
+# Artist <-> venue match scoring.
+#----------------------------------------------------------------------------#
+# Both sides are held column-wise: a dense 0/1 genre matrix (one row per
+# entity, one column per genre), integer city and state codes and a seeking
+# flag. Ranking the other side for one entity is a matrix-vector product plus
+# a few vector comparisons, then a partial sort for the top results. Shows
+# the pair already played together are passed in per query (they come from
+# an indexed GROUP BY) and added sparsely.
+#
+# NumPy is optional: without it the same score is computed with plain Python
+# loops, which is fine for small databases but not for the 100k x 20k case.
+
+import heapq
+import math
+import random
+import time
+
+try:
+  import numpy as np
+except ImportError:
+  np = None
+
+WEIGHTS = {
+  "genre": 3.0,    # share of the entity's genres the candidate also has
+  "city": 2.0,
+  "state": 1.0,
+  "seeking": 1.0,  # the candidate is looking for talent / for a venue
+  "history": 1.5,  # log(1 + shows the pair already played together)
+}
+
+
+def normalize_city(city):
+  return ' '.join((city or '').casefold().split())
+
+
+class Side(object):
+  # the entities of one kind, column-wise
+
+  def __init__(self, rows, genre_columns, cities):
+    # rows: (id, city, state, seeking, genre_ids); genre_columns and cities
+    # map genre ids / normalized city names to column numbers / codes and are
+    # shared with the other side so codes compare equal
+    rows = list(rows)
+    self.ids = [row[0] for row in rows]
+    self.position = {entity_id: i for i, entity_id in enumerate(self.ids)}
+    self.genres = [[genre_columns[genre_id] for genre_id in row[4] if genre_id in genre_columns] for row in rows]
+    self.city = [cities.setdefault(normalize_city(row[1]), len(cities)) if row[1] else -1 for row in rows]
+    self.state = [row[2] if row[2] is not None else -1 for row in rows]
+    self.seeking = [bool(row[3]) for row in rows]
+    if np is not None:
+      self.ids = np.array(self.ids, dtype=np.int64)
+      matrix = np.zeros((len(rows), max(len(genre_columns), 1)), dtype=np.float32)
+      for i, columns in enumerate(self.genres):
+        matrix[i, columns] = 1
+      self.matrix = matrix
+      self.city = np.array(self.city, dtype=np.int32)
+      self.state = np.array(self.state, dtype=np.int32)
+      self.seeking = np.array(self.seeking, dtype=bool)
+
+  def __len__(self):
+    return len(self.position)
+
+
+class Matcher(object):
+
+  def __init__(self, artists, venues, weights=WEIGHTS):
+    artists, venues = list(artists), list(venues)
+    genre_ids = sorted({genre_id for rows in (artists, venues) for row in rows for genre_id in row[4]})
+    genre_columns = {genre_id: i for i, genre_id in enumerate(genre_ids)}
+    cities = {}
+    self.sides = {
+      'artist': Side(artists, genre_columns, cities),
+      'venue': Side(venues, genre_columns, cities),
+    }
+    self.weights = weights
+    self.vectorized = np is not None
+    self.built = time.time()
+
+  def __contains__(self, key):
+    kind, entity_id = key
+    return entity_id in self.sides[kind].position
+
+  def rank(self, kind, entity_id, history=None, limit=10):
+    # best matches on the other side for one `kind` entity, as (id, score)
+    # pairs with a positive score, best first. history: {other id: shows}.
+    own = self.sides[kind]
+    other = self.sides['venue' if kind == 'artist' else 'artist']
+    i = own.position[entity_id]
+    if not len(other):
+      return []
+    genres, city, state = own.genres[i], own.city[i], own.state[i]
+    w = self.weights
+    if self.vectorized:
+      scores = np.zeros(len(other), dtype=np.float32)
+      if genres:
+        wanted = np.zeros(other.matrix.shape[1], dtype=np.float32)
+        wanted[genres] = w["genre"] / len(genres)
+        scores += other.matrix @ wanted
+      if city >= 0:
+        scores += w["city"] * (other.city == city)
+      if state >= 0:
+        scores += w["state"] * (other.state == state)
+      scores += w["seeking"] * other.seeking
+      if history:
+        pairs = [(other.position[other_id], shows) for other_id, shows in history.items()
+          if other_id in other.position]
+        if pairs:
+          rows, counts = zip(*pairs)
+          scores[list(rows)] += w["history"] * np.log1p(np.array(counts, dtype=np.float32))
+      k = max(min(limit, len(scores)), 1)
+      top = np.argpartition(-scores, k - 1)[:k]
+      top = top[np.argsort(-scores[top], kind='stable')]
+      return [(int(other.ids[j]), round(float(scores[j]), 3)) for j in top if scores[j] > 0]
+
+    wanted = set(genres)
+    history = history or {}
+    def score(j):
+      value = 0.0
+      if wanted:
+        value += w["genre"] * len(wanted.intersection(other.genres[j])) / len(wanted)
+      if city >= 0 and other.city[j] == city:
+        value += w["city"]
+      if state >= 0 and other.state[j] == state:
+        value += w["state"]
+      if other.seeking[j]:
+        value += w["seeking"]
+      shows = history.get(other.ids[j])
+      if shows:
+        value += w["history"] * math.log1p(shows)
+      return value
+    top = heapq.nlargest(limit, ((score(j), j) for j in range(len(other))), key=lambda pair: pair[0])
+    return [(other.ids[j], round(value, 3)) for value, j in top if value > 0]
+
+
+#----------------------------------------------------------------------------#
+# Benchmark: python recommend.py
+#----------------------------------------------------------------------------#
+
+def benchmark(artists=100000, venues=20000, genres=19, cities=500, states=51, queries=200, seed=0):
+  rng = random.Random(seed)
+  def rows(count):
+    return [(i, f'city {rng.randrange(cities)}', rng.randrange(states), rng.random() < 0.3,
+      rng.sample(range(genres), rng.randint(1, 3))) for i in range(1, count + 1)]
+  started = time.perf_counter()
+  matcher = Matcher(rows(artists), rows(venues))
+  build_s = time.perf_counter() - started
+  timings = []
+  for _ in range(queries):
+    artist_id = rng.randint(1, artists)
+    history = {rng.randint(1, venues): rng.randint(1, 5) for _ in range(rng.randint(0, 20))}
+    started = time.perf_counter()
+    matcher.rank('artist', artist_id, history)
+    timings.append(time.perf_counter() - started)
+  timings.sort()
+  return {
+    "artists": artists,
+    "venues": venues,
+    "vectorized": matcher.vectorized,
+    "build_ms": round(build_s * 1000, 1),
+    "p50_ms": round(timings[len(timings) // 2] * 1000, 2),
+    "p99_ms": round(timings[int(len(timings) * 0.99)] * 1000, 2),
+  }
+
+if __name__ == '__main__':
+  import json
+  print(json.dumps(benchmark()))
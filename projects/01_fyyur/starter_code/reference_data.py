@@ -0,0 +1,67 @@
+#----------------------------------------------------------------------------#
+# Reference data: genres and states.
+#----------------------------------------------------------------------------#
+# One registry shared by the forms and the controllers. It starts from the
+# seed below (same ids as the seed rows in me.txt) and is replaced by the
+# Genre/State tables the first time the app talks to the database.
+
+GENRES = (
+  'Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk',
+  'Funk', 'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz',
+  'Musical Theatre', 'Pop', 'Punk', 'R&B', 'Reggae', 'Rock n Roll', 'Soul',
+  'Other',
+)
+
+STATES = (
+  'AL', 'AK', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DE', 'DC', 'FL', 'GA', 'HI',
+  'ID', 'IL', 'IN', 'IA', 'KS', 'KY', 'LA', 'ME', 'MT', 'NE', 'NV', 'NH',
+  'NJ', 'NM', 'NY', 'NC', 'ND', 'OH', 'OK', 'OR', 'MD', 'MA', 'MI', 'MN',
+  'MS', 'MO', 'PA', 'RI', 'SC', 'SD', 'TN', 'TX', 'UT', 'VT', 'VA', 'WA',
+  'WV', 'WI', 'WY',
+)
+
+
+class Lookup(object):
+  # O(1) id <-> name maps plus a `choices` list for WTForms. `choices` is
+  # updated in place so form classes built at import time see reloads.
+
+  def __init__(self, names):
+    self.names = {}
+    self.ids = {}
+    self.choices = []
+    self.load(enumerate(names, 1))
+
+  def load(self, rows):
+    rows = sorted(rows)
+    self.names = {row_id: name for row_id, name in rows}
+    self.ids = {name: row_id for row_id, name in rows}
+    self.choices[:] = [(name, name) for _, name in rows]
+
+  def id(self, name):
+    return self.ids.get(name)
+
+  def name(self, row_id):
+    return self.names.get(row_id)
+
+  def ids_for(self, names):
+    # unknown names are skipped; the forms already restrict input to choices
+    return [self.ids[name] for name in names if name in self.ids]
+
+  def __len__(self):
+    return len(self.names)
+
+
+genres = Lookup(GENRES)
+states = Lookup(STATES)
+loaded = False
+
+def load(genre_rows, state_rows):
+  # rows are (id, name) pairs read from the Genre and State tables. An empty
+  # table keeps the seed so a fresh database still renders the forms.
+  global loaded
+  genre_rows, state_rows = list(genre_rows), list(state_rows)
+  if genre_rows:
+    genres.load(genre_rows)
+  if state_rows:
+    states.load(state_rows)
+  loaded = True
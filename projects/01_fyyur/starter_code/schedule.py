@@ -0,0 +1,72 @@
+#----------------------------------------------------------------------------#
+# Bulk show schedules: parsing and recurrence expansion.
+#----------------------------------------------------------------------------#
+# A schedule is a list of rows with artist_id, venue_id, start_time and an
+# optional RFC 5545 `rrule` ("FREQ=WEEKLY;BYDAY=TU;COUNT=12" is every Tuesday
+# for 12 weeks). Rows come from a JSON body ({"shows": [...]}) or a CSV file
+# with those column names. Nothing here touches the database.
+
+import csv
+import io
+from itertools import islice
+
+from dateutil import parser as date_parser
+from dateutil.rrule import rrulestr
+
+FIELDS = ('artist_id', 'venue_id', 'start_time', 'rrule')
+
+
+class ScheduleError(ValueError):
+  pass
+
+
+def read_json(payload):
+  if isinstance(payload, dict):
+    payload = payload.get('shows')
+  if not isinstance(payload, list) or not all(isinstance(row, dict) for row in payload):
+    raise ScheduleError('expected {"shows": [{"artist_id", "venue_id", "start_time"}, ...]}')
+  return payload
+
+
+def read_csv(stream):
+  text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+  reader = csv.DictReader(text)
+  missing = set(FIELDS[:3]) - set(reader.fieldnames or ())
+  if missing:
+    raise ScheduleError('missing CSV columns: ' + ', '.join(sorted(missing)))
+  return list(reader)
+
+
+def expand(rows, max_slots):
+  # Returns (slots, errors). A slot is (row, artist_id, venue_id, start_time)
+  # where `row` is the 1-based input row it came from; errors are
+  # {"row", "error"} dicts. Recurrences must be bounded by COUNT or UNTIL.
+  slots, errors = [], []
+  for row_number, row in enumerate(rows, 1):
+    try:
+      artist_id = int(row['artist_id'])
+      venue_id = int(row['venue_id'])
+      start_time = row['start_time']
+      if not hasattr(start_time, 'year'):
+        start_time = date_parser.parse(start_time)
+      if start_time.tzinfo is not None:
+        # Show.start_time is naive local time, like the rest of the app
+        start_time = start_time.astimezone().replace(tzinfo=None)
+      rule = (row.get('rrule') or '').strip()
+      if rule:
+        recurrence = rrulestr(rule, dtstart=start_time)
+        if getattr(recurrence, '_count', None) is None and getattr(recurrence, '_until', None) is None:
+          raise ScheduleError('rrule needs COUNT or UNTIL')
+        start_times = list(islice(recurrence, max_slots - len(slots) + 1))
+      else:
+        start_times = [start_time]
+    except KeyError as e:
+      errors.append({"row": row_number, "error": f'missing {e.args[0]}'})
+      continue
+    except (TypeError, ValueError, OverflowError) as e:
+      errors.append({"row": row_number, "error": str(e)})
+      continue
+    if len(slots) + len(start_times) > max_slots:
+      raise ScheduleError(f'schedule expands to more than {max_slots} shows')
+    slots.extend((row_number, artist_id, venue_id, when) for when in start_times)
+  return slots, errors
@@ -0,0 +1,91 @@
+#----------------------------------------------------------------------------#
+# Synthetic data for local load testing (see `flask seed-synthetic`).
+#----------------------------------------------------------------------------#
+# Row generators only; app.py does the inserting. Everything is driven by a
+# seeded random.Random so two runs with the same arguments give the same data.
+
+from datetime import datetime, timedelta
+
+import reference_data
+
+WORDS = (
+  'Blue', 'Red', 'Golden', 'Velvet', 'Electric', 'Silver', 'Midnight', 'Lucky',
+  'Wild', 'Rusty', 'Neon', 'Crystal', 'Black', 'Broken', 'Little', 'Grand',
+  'Hop', 'Room', 'Hall', 'Lounge', 'Garden', 'Cellar', 'Tavern', 'Stage',
+  'Band', 'Sax', 'Petals', 'Pianos', 'Echo', 'Rebels', 'Kings', 'Owls',
+)
+CITIES = (
+  'San Francisco', 'New York', 'Austin', 'Chicago', 'Seattle', 'Nashville',
+  'New Orleans', 'Denver', 'Portland', 'Boston', 'Atlanta', 'Detroit',
+  'Memphis', 'Los Angeles', 'Miami', 'Minneapolis',
+)
+
+
+def names(seeded, count, prefix):
+  # reference names first, then generated ones once those run out
+  result = list(seeded[:count])
+  result += [f'{prefix}{i}' for i in range(len(result) + 1, count + 1)]
+  return result
+
+
+def genre_rows(count):
+  return [{"name": name} for name in names(reference_data.GENRES, count, 'Genre ')]
+
+
+def state_rows(count):
+  return [{"name": name} for name in names(reference_data.STATES, count, 'S')]
+
+
+def _name(rng, suffix):
+  return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))) + f' {suffix}'
+
+
+def venue_rows(rng, count, state_ids):
+  for i in range(count):
+    yield {
+      "name": _name(rng, i),
+      "city": rng.choice(CITIES),
+      "state": rng.choice(state_ids),
+      "address": f'{rng.randint(1, 9999)} {rng.choice(WORDS)} Street',
+      "phone": f'{rng.randint(200, 999)}-{rng.randint(100, 999)}-{rng.randint(1000, 9999)}',
+      "seeking_talent": rng.random() < 0.3,
+    }
+
+
+def artist_rows(rng, count, state_ids):
+  for i in range(count):
+    yield {
+      "name": _name(rng, i),
+      "city": rng.choice(CITIES),
+      "state": rng.choice(state_ids),
+      "phone": f'{rng.randint(200, 999)}-{rng.randint(100, 999)}-{rng.randint(1000, 9999)}',
+      "seeking_venue": rng.random() < 0.3,
+    }
+
+
+def genre_links(rng, owner_ids, genre_ids, owner, most=3):
+  for owner_id in owner_ids:
+    for genre_id in rng.sample(genre_ids, rng.randint(1, min(most, len(genre_ids)))):
+      yield {owner: owner_id, "genre_id": genre_id}
+
+
+def show_rows(rng, count, venue_ids, artist_ids, days=365, now=None):
+  # spread over [now - days, now + days] so roughly half are upcoming
+  now = (now or datetime.now()).replace(minute=0, second=0, microsecond=0)
+  for _ in range(count):
+    yield {
+      "venue_id": rng.choice(venue_ids),
+      "artist_id": rng.choice(artist_ids),
+      "start_time": now + timedelta(days=rng.randint(-days, days), hours=rng.randint(0, 23)),
+    }
+
+
+def batches(rows, size):
+  batch = []
+  for row in rows:
+    batch.append(row)
+    if len(batch) == size:
+      yield batch
+      batch = []
+  if batch:
+    yield batch
@@ -0,0 +1,73 @@
+import unittest
+
+from app import app, db, Venue, Artist, Genre, State
+import reference_data
+
+
+class AutocompleteTestCase(unittest.TestCase):
+    """The in-memory name index follows Venue/Artist writes"""
+
+    @classmethod
+    def setUpClass(cls):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['PAGE_CACHE'] = False
+        cls.ctx = app.app_context()
+        cls.ctx.push()
+        db.drop_all()
+        db.create_all()
+        db.session.bulk_insert_mappings(Genre, [{"name": name} for name in reference_data.GENRES])
+        db.session.bulk_insert_mappings(State, [{"name": name} for name in reference_data.STATES])
+        db.session.bulk_insert_mappings(Venue, [{"name": f'Venue {i}', "city": 'City', "state": 1} for i in (1, 2)])
+        db.session.bulk_insert_mappings(Artist, [{"name": f'Artist {i}', "city": 'City', "state": 1} for i in (1, 2)])
+        db.session.commit()
+
+    @classmethod
+    def tearDownClass(cls):
+        db.session.remove()
+        db.drop_all()
+        cls.ctx.pop()
+
+    def setUp(self):
+        self.client = app.test_client()
+
+    def tearDown(self):
+        db.session.rollback()
+
+    def suggest(self, query, kind='venue'):
+        return [row['id'] for row in self.client.get(f'/autocomplete?type={kind}&q={query}').json['data']]
+
+    def test_archived_rename(self):
+        """Renaming an archived venue, by form or through the ORM, does not suggest it again"""
+        self.assertEqual(self.suggest('Venue 1'), [1])
+        self.assertEqual(self.client.delete('/venues/1?archive=1').status_code, 200)
+        self.assertEqual(self.suggest('Venue 1'), [])
+        version = db.session.get(Venue, 1).version
+        db.session.rollback()
+        self.client.post('/venues/1/edit', data={"version": version, "name": 'Archived Hall'})
+        self.assertEqual(db.session.get(Venue, 1).name, 'Archived Hall')
+        self.assertEqual(self.suggest('Archived'), [])
+        db.session.get(Venue, 1).name = 'Archived Hall Renamed'
+        db.session.commit()
+        self.assertEqual(self.suggest('Archived'), [])
+
+    def test_other_worker(self):
+        """Renames and deletes committed by another worker reach the name index"""
+        self.suggest('Artist', 'artist')
+        interval, app.config['INDEX_SYNC_SECONDS'] = app.config['INDEX_SYNC_SECONDS'], 0
+        try:
+            with db.engine.begin() as connection:
+                # straight to the database, as another process would
+                connection.execute(Artist.__table__.update().where(Artist.id == 1).values(name='Zanzibar Brass'))
+            self.assertEqual(self.suggest('zanzi', 'artist'), [1])
+            with db.engine.begin() as connection:
+                connection.execute(Artist.__table__.update().where(Artist.id == 2).values(name='Zanzibar Strings'))
+                connection.execute(Artist.__table__.delete().where(Artist.id == 1))
+            self.assertEqual(self.suggest('zanzi', 'artist'), [2])
+        finally:
+            app.config['INDEX_SYNC_SECONDS'] = interval
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+
+from app import app, db, Venue, Genre, State, venueGenres
+import reference_data
+
+
+class EditVenueTestCase(unittest.TestCase):
+    """/venues/<id>/edit validates the submitted fields before storing them"""
+
+    @classmethod
+    def setUpClass(cls):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['PAGE_CACHE'] = False
+        cls.ctx = app.app_context()
+        cls.ctx.push()
+        db.drop_all()
+        db.create_all()
+        db.session.bulk_insert_mappings(Genre, [{"name": name} for name in reference_data.GENRES])
+        db.session.bulk_insert_mappings(State, [{"name": name} for name in reference_data.STATES])
+        db.session.bulk_insert_mappings(Venue, [{"name": 'Edited Venue', "city": 'City', "state": 1}])
+        db.session.execute(venueGenres.insert(), [{"venue_id": 1, "genre_id": genre_id} for genre_id in (1, 2, 3)])
+        db.session.commit()
+
+    @classmethod
+    def tearDownClass(cls):
+        db.session.remove()
+        db.drop_all()
+        cls.ctx.pop()
+
+    def setUp(self):
+        self.client = app.test_client()
+
+    def tearDown(self):
+        db.session.rollback()
+
+    def test_validation(self):
+        """Edits run the form validators on the submitted fields and store nothing on failure"""
+        venue = db.session.get(Venue, 1)
+        version, name = venue.version, venue.name
+        db.session.rollback()
+        for form in ({"facebook_link": 'not a url'}, {"genres": ['Not a genre']}, {"genres": ''}, {"name": ''}):
+            response = self.client.post('/venues/1/edit', data=dict(form, version=version))
+            self.assertEqual(response.status_code, 302)
+            self.assertTrue(response.location.endswith('/venues/1/edit'), form)
+            venue = db.session.get(Venue, 1)
+            self.assertEqual((venue.version, venue.name, venue.facebook_link), (version, name, None))
+            self.assertEqual(len(venue.genres), 3)
+            db.session.rollback()
+        response = self.client.post('/venues/1/edit', data={"version": version, "facebook_link": 'https://facebook.com/venue1'})
+        self.assertTrue(response.location.endswith('/venues/1'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import random
+import unittest
+
+from app import app, db, Venue, Genre, State
+from facets import FacetIndex, FacetSet, bits_from_ids, iter_ids
+import reference_data
+
+
+class FacetIndexTestCase(unittest.TestCase):
+    """The bulk build produces the same bitsets as setting entities one by one"""
+
+    def test_bits_from_ids(self):
+        self.assertEqual(bits_from_ids([]), 0)
+        self.assertEqual(list(iter_ids(bits_from_ids([9, 0, 64, 7]))), [0, 7, 9, 64])
+
+    def test_build_matches_set(self):
+        rng = random.Random(0)
+        entries = [('artist', entity_id, rng.choice([None, 1, 2, 3]), rng.random() < 0.3,
+                    rng.sample(range(19), rng.randint(0, 3))) for entity_id in rng.sample(range(1, 5000), 2000)]
+        index = FacetIndex()
+        index.build(entries)
+        expected = FacetSet()
+        for _, entity_id, state, seeking, genre_ids in entries:
+            expected.set(entity_id, state, seeking, genre_ids)
+        built = index._sets['artist']
+        for name in ('all', 'seeking', 'genres', 'states', 'entries'):
+            self.assertEqual(getattr(built, name), getattr(expected, name), name)
+        self.assertEqual(index.search('venue'), (0, [], {"genres": {}, "states": {}, "seeking": 0}))
+
+
+class BrowseTestCase(unittest.TestCase):
+    """/venues/browse and /artists/browse are served from the facet index"""
+
+    @classmethod
+    def setUpClass(cls):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['TESTING'] = True
+        app.config['PAGE_CACHE'] = False
+        cls.ctx = app.app_context()
+        cls.ctx.push()
+        db.drop_all()
+        db.create_all()
+        db.session.bulk_insert_mappings(Genre, [{"name": name} for name in reference_data.GENRES])
+        db.session.bulk_insert_mappings(State, [{"name": name} for name in reference_data.STATES])
+        db.session.bulk_insert_mappings(Venue, [{
+            "name": f'Venue {i}', "city": 'City', "state": 1 + i % 2, "seeking_talent": i % 3 == 0,
+        } for i in range(12)])
+        db.session.commit()
+
+    @classmethod
+    def tearDownClass(cls):
+        db.session.remove()
+        db.drop_all()
+        cls.ctx.pop()
+
+    def setUp(self):
+        self.client = app.test_client()
+
+    def tearDown(self):
+        db.session.rollback()
+
+    def test_other_worker(self):
+        """Facet changes committed by another worker reach the facet index"""
+        def seeking_states():
+            return self.client.get('/venues/browse?seeking=yes&state=AL').json['count']
+        before = seeking_states()
+        interval, app.config['INDEX_SYNC_SECONDS'] = app.config['INDEX_SYNC_SECONDS'], 0
+        try:
+            with db.engine.begin() as connection:
+                # straight to the database, as another process would
+                connection.execute(Venue.__table__.update().where(Venue.id == 2).values(
+                    state=1, seeking_talent=True))
+            self.assertEqual(seeking_states(), before + 1)
+        finally:
+            app.config['INDEX_SYNC_SECONDS'] = interval
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,24 @@
+import unittest
+from datetime import datetime
+
+import babel.dates
+
+from app import format_datetime
+
+
+class FormatDatetimeTestCase(unittest.TestCase):
+    """The `datetime` template filter"""
+
+    def test_named_formats(self):
+        """Named formats match Babel's; ours override medium and full"""
+        value = datetime(2035, 4, 1, 20, 5)
+        for name in ('short', 'long'):
+            for locale in ('en_US', 'de_DE'):
+                self.assertEqual(format_datetime(value, name, locale),
+                                 babel.dates.format_datetime(value, name, locale=locale))
+        self.assertEqual(format_datetime('2035-04-01T20:05:00', 'medium', 'en_US'), 'Sun 04, 01, 2035 8:05PM')
+        self.assertEqual(format_datetime(value, 'yyyy-MM-dd', 'en_US'), '2035-04-01')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import os
+import json
+import tempfile
+import unittest
+
+from app import app, db, Artist, Genre, State
+import reference_data
+
+
+class ImportArtistsTestCase(unittest.TestCase):
+    """The import-artists command"""
+
+    @classmethod
+    def setUpClass(cls):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['TESTING'] = True
+        app.config['PAGE_CACHE'] = False
+        cls.ctx = app.app_context()
+        cls.ctx.push()
+        db.drop_all()
+        db.create_all()
+        db.session.bulk_insert_mappings(Genre, [{"name": name} for name in reference_data.GENRES])
+        db.session.bulk_insert_mappings(State, [{"name": name} for name in reference_data.STATES])
+        db.session.commit()
+
+    @classmethod
+    def tearDownClass(cls):
+        db.session.remove()
+        db.drop_all()
+        cls.ctx.pop()
+
+    def tearDown(self):
+        db.session.rollback()
+
+    def import_artists(self, document):
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as stream:
+            json.dump(document, stream)
+        try:
+            return app.test_cli_runner().invoke(args=['import-artists', stream.name])
+        finally:
+            os.unlink(stream.name)
+
+    def test_json_values(self):
+        """JSON numbers are read as strings; other bad values are per-row errors"""
+        result = self.import_artists({"artists": [
+            {"name": 'Imported 1', "city": 'City', "state": 'AL', "seeking_venue": 1, "genres": ['Jazz']},
+            {"name": 'Imported 2', "city": 'City', "state": 'AL', "seeking_venue": 0, "genres": 'Jazz;Blues'},
+            {"name": ['Imported 3'], "city": 'City', "state": 'AL', "seeking_venue": 1, "genres": ['Jazz']},
+            {"name": 'Imported 4', "city": 'City', "state": 'AL', "seeking_venue": 1, "genres": [7]},
+        ]})
+        self.assertEqual(result.exit_code, 0, result.output)
+        report = json.loads(result.output)
+        self.assertEqual(report['created'], 2)
+        self.assertEqual([error['row'] for error in report['errors']], [3, 4])
+        self.assertEqual(dict(db.session.query(Artist.name, Artist.seeking_venue).filter(
+            Artist.name.in_(['Imported 1', 'Imported 2']))), {'Imported 1': True, 'Imported 2': False})
+
+
+if __name__ == "__main__":
+    unittest.main()
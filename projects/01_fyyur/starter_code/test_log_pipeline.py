@@ -0,0 +1,50 @@
+import io
+import json
+import logging
+import unittest
+
+from log_pipeline import JSONFormatter, QueuedLogging
+
+
+class LogPipelineTestCase(unittest.TestCase):
+    """Records go through the queue and come out as JSON lines"""
+
+    def setUp(self):
+        self.stream = io.StringIO()
+        handler = logging.StreamHandler(self.stream)
+        handler.setFormatter(JSONFormatter())
+        self.logger = logging.getLogger('fyyur.test_log_pipeline')
+        self.logger.propagate = False
+        self.pipeline = QueuedLogging(100)
+        self.queue_handler = self.pipeline.add(self.logger, handler)
+        self.pipeline.start()
+
+    def tearDown(self):
+        self.pipeline.stop()
+        self.logger.removeHandler(self.queue_handler)
+
+    def entries(self):
+        self.pipeline.stop()
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+    def test_exception_field(self):
+        """A traceback is written as its own field, not into the message"""
+        try:
+            raise ValueError('broken')
+        except ValueError:
+            self.logger.exception('could not %s', 'work')
+        entry, = self.entries()
+        self.assertEqual(entry['message'], 'could not work')
+        self.assertIn('ValueError: broken', entry['exc'])
+        self.assertIn('Traceback', entry['exc'])
+
+    def test_fields(self):
+        """extra fields are merged in and plain records have no exc field"""
+        self.logger.warning('slow query', extra={"fields": {"ms": 120}})
+        entry, = self.entries()
+        self.assertEqual((entry['message'], entry['ms']), ('slow query', 120))
+        self.assertNotIn('exc', entry)
+
+
+if __name__ == "__main__":
+    unittest.main()
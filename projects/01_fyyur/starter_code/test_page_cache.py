@@ -0,0 +1,118 @@
+import unittest
+from datetime import datetime, timedelta
+
+from app import app, db, page_cache, Venue, Artist, Show, Genre, State
+import reference_data
+
+
+class PageCacheTestCase(unittest.TestCase):
+    """Rendered pages are reused until a write they depend on commits"""
+
+    @classmethod
+    def setUpClass(cls):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['PAGE_CACHE'] = True
+        cls.ctx = app.app_context()
+        cls.ctx.push()
+        db.drop_all()
+        db.create_all()
+        db.session.bulk_insert_mappings(Genre, [{"name": name} for name in reference_data.GENRES])
+        db.session.bulk_insert_mappings(State, [{"name": name} for name in reference_data.STATES])
+        db.session.bulk_insert_mappings(Venue, [
+            {"name": f'Venue {i}', "city": 'City', "state": 1, "seeking_talent": False} for i in range(1, 5)])
+        db.session.bulk_insert_mappings(Artist, [{"name": 'Cached Artist', "city": 'City', "state": 1}])
+        db.session.commit()
+
+    @classmethod
+    def tearDownClass(cls):
+        app.config['PAGE_CACHE'] = False
+        db.session.remove()
+        db.drop_all()
+        cls.ctx.pop()
+
+    def setUp(self):
+        self.client = app.test_client()
+
+    def tearDown(self):
+        db.session.rollback()
+
+    def get(self, path, outcome):
+        # the response body, asserting it was a cache 'hits'/'misses'/'bypassed'
+        before = page_cache.stats()
+        body = self.client.get(path).get_data(as_text=True)
+        after = page_cache.stats()
+        changed = [name for name in ('hits', 'misses', 'bypassed') if after[name] != before[name]]
+        self.assertEqual(changed, [outcome], path)
+        return body
+
+    def flash(self, message):
+        with self.client.session_transaction() as session:
+            session['_flashes'] = [('message', message)]
+
+    def test_second_get_hits(self):
+        first = self.get('/venues/1', 'misses')
+        self.assertEqual(self.get('/venues/1', 'hits'), first)
+        self.client.get('/venues')
+        self.get('/venues', 'hits')
+
+    def test_edit_invalidates(self):
+        """An edit to the venue invalidates its page and the listing"""
+        self.get('/venues/2', 'misses')
+        self.client.get('/venues')
+        self.get('/venues', 'hits')
+        version = db.session.get(Venue, 2).version
+        db.session.rollback()
+        response = self.client.post('/venues/2/edit', data={"version": version, "name": 'Venue 2 renamed'})
+        self.assertEqual(response.status_code, 302)
+        # the success flash is pending on the next page
+        self.assertIn('Venue 2 renamed', self.get('/venues/2', 'bypassed'))
+        self.assertIn('Venue 2 renamed', self.get('/venues/2', 'misses'))
+        self.assertIn('Venue 2 renamed', self.get('/venues', 'misses'))
+
+    def test_new_show_invalidates(self):
+        """A show added to the venue, by the ORM or in bulk, invalidates its page"""
+        self.get('/venues/3', 'misses')
+        self.get('/venues/3', 'hits')
+        db.session.add(Show(venue_id=3, artist_id=1, start_time=datetime.now() + timedelta(days=2)))
+        db.session.commit()
+        self.assertIn('Cached Artist', self.get('/venues/3', 'misses'))
+        self.get('/venues/3', 'hits')
+        response = self.client.post('/shows/bulk', json={"shows": [
+            {"artist_id": 1, "venue_id": 3, "start_time": (datetime.now() + timedelta(days=9)).isoformat()}]})
+        self.assertEqual(response.json['created'], 1)
+        page = self.get('/venues/3', 'misses')
+        self.assertEqual(page.count('Cached Artist'), 2)
+
+    def test_other_worker_write(self):
+        """A write this process never saw is caught by the signature, for both body and ETag"""
+        self.get('/artists/1', 'misses')
+        etag = self.client.get('/artists/1').headers['ETag']
+        with db.engine.begin() as connection:
+            # straight to the database, as another worker would
+            connection.execute(Artist.__table__.update().where(Artist.id == 1).values(city='Elsewhere'))
+        self.assertIn('Elsewhere', self.get('/artists/1', 'misses'))
+        response = self.client.get('/artists/1', headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+        self.assertIn('Elsewhere', response.get_data(as_text=True))
+        with db.engine.begin() as connection:
+            connection.execute(Artist.__table__.update().where(Artist.id == 1).values(city='City'))
+
+    def test_flash_bypasses_cache(self):
+        """A page with a pending flash is neither served from nor stored in the cache"""
+        self.get('/venues/4', 'misses')
+        self.flash('Pending flash one')
+        self.assertIn('Pending flash one', self.get('/venues/4', 'bypassed'))
+        cached = self.get('/venues/4', 'hits')
+        self.assertNotIn('Pending flash one', cached)
+        # nothing stored while the flash was pending: a later miss
+        # renders fresh, without the flash
+        self.flash('Pending flash two')
+        self.assertIn('Pending flash two', self.get('/artists/1', 'bypassed'))
+        self.assertNotIn('Pending flash two', self.get('/artists/1', 'misses'))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from sqlalchemy import create_engine
+
+from app import app, db, replicas, Venue, Genre, State
+import reference_data
+
+
+class ReplicaRoutingTestCase(unittest.TestCase):
+    """Read-only views query the replica unless it lags or the client just wrote"""
+
+    @classmethod
+    def setUpClass(cls):
+        # two SQLite files stand in for the primary and a replica that has
+        # not caught up: the same venue has a different name on each
+        cls.directory = tempfile.mkdtemp()
+        cls.saved = {key: app.config.get(key) for key in (
+            'SQLALCHEMY_DATABASE_URI', 'SQLALCHEMY_BINDS', 'READ_REPLICAS', 'REPLICA_LAG_CHECK_SECONDS')}
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(cls.directory, 'primary.db')
+        app.config['SQLALCHEMY_BINDS'] = {'replica_1': 'sqlite:///' + os.path.join(cls.directory, 'replica.db')}
+        app.config['READ_REPLICAS'] = ['replica_1']
+        app.config['REPLICA_LAG_CHECK_SECONDS'] = 0
+        app.config['TESTING'] = True
+        app.config['WTF_CSRF_ENABLED'] = False
+        app.config['PAGE_CACHE'] = False
+        cls.ctx = app.app_context()
+        cls.ctx.push()
+        db.create_all()
+        db.Model.metadata.create_all(db.get_engine(app, bind='replica_1'))
+        for engine, name in ((db.engine, 'Primary Hall'), (db.get_engine(app, bind='replica_1'), 'Replica Hall')):
+            with engine.begin() as connection:
+                connection.execute(Genre.__table__.insert(), [{"name": name} for name in reference_data.GENRES])
+                connection.execute(State.__table__.insert(), [{"name": name} for name in reference_data.STATES])
+                connection.execute(Venue.__table__.insert(), [{"id": 1, "name": name, "city": 'City', "state": 1}])
+
+    @classmethod
+    def tearDownClass(cls):
+        db.session.remove()
+        for engine in (db.engine, db.get_engine(app, bind='replica_1')):
+            engine.dispose()
+        cls.ctx.pop()
+        app.config.update(cls.saved)
+        shutil.rmtree(cls.directory)
+
+    def setUp(self):
+        self.client = app.test_client()
+        self.measure_lag = replicas.measure_lag
+
+    def tearDown(self):
+        replicas.measure_lag = self.measure_lag
+        db.session.rollback()
+
+    def test_reads_use_replica(self):
+        """Listing, detail and search pages are read from the replica"""
+        self.assertIn(b'Replica Hall', self.client.get('/venues').data)
+        self.assertIn(b'Replica Hall', self.client.get('/venues/1').data)
+        self.assertIn(b'Replica Hall', self.client.post('/venues/search', data={"search_term": 'Hall'}).data)
+
+    def test_lagging_replica_falls_back(self):
+        """A replica behind by more than REPLICA_MAX_LAG_SECONDS is skipped"""
+        replicas.measure_lag = lambda engine: app.config['REPLICA_MAX_LAG_SECONDS'] + 1
+        self.assertIn(b'Primary Hall', self.client.get('/venues/1').data)
+
+    def test_unreachable_replica(self):
+        """An unreachable replica reports no lag at all and is skipped"""
+        engine = create_engine('sqlite:///' + os.path.join(self.directory, 'missing', 'replica.db'))
+        self.assertIsNone(replicas.measure_lag(engine))
+        replicas.measure_lag = lambda engine: None
+        self.assertIn(b'Primary Hall', self.client.get('/venues/1').data)
+
+    def test_write_pins_client(self):
+        """After a write the same client reads its own write from the primary"""
+        version = db.session.get(Venue, 1).version
+        db.session.rollback()
+        response = self.client.post('/venues/1/edit', data={
+            "version": version, "name": 'Primary Hall', "city": 'City', "genres": [reference_data.GENRES[0]]})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(b'Primary Hall', self.client.get('/venues/1').data)
+        self.assertIn(b'Replica Hall', app.test_client().get('/venues/1').data)
+
+    def test_page_cache_read_your_writes(self):
+        """Pages rendered from the replica are not cached for the writer to find"""
+        # without ETags only the cache's own versions key the pages
+        app.config.update(PAGE_CACHE=True, CONDITIONAL_GET=False)
+        try:
+            version = db.session.get(Venue, 1).version
+            db.session.rollback()
+            response = self.client.post('/venues/1/edit', data={"version": version, "name": 'Primary Hall Renamed'})
+            self.assertEqual(response.status_code, 302)
+            # consumes the success flash, which bypasses the cache
+            self.client.get('/venues/1')
+            self.assertIn(b'Replica Hall', app.test_client().get('/venues/1').data)
+            self.assertIn(b'Primary Hall Renamed', self.client.get('/venues/1').data)
+            self.assertIn(b'Primary Hall Renamed', self.client.get('/venues').data)
+        finally:
+            app.config.update(PAGE_CACHE=False, CONDITIONAL_GET=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+from datetime import datetime, timezone
+
+from app import app, db, Venue, Artist, Show, Genre, State
+import reference_data
+
+
+class BulkScheduleTestCase(unittest.TestCase):
+    """/shows/bulk parses start times the way the sample data writes them"""
+
+    @classmethod
+    def setUpClass(cls):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['TESTING'] = True
+        app.config['PAGE_CACHE'] = False
+        cls.ctx = app.app_context()
+        cls.ctx.push()
+        db.drop_all()
+        db.create_all()
+        db.session.bulk_insert_mappings(Genre, [{"name": name} for name in reference_data.GENRES])
+        db.session.bulk_insert_mappings(State, [{"name": name} for name in reference_data.STATES])
+        db.session.bulk_insert_mappings(Venue, [{"name": f'Venue {i}', "city": 'City', "state": 1} for i in (1, 2)])
+        db.session.bulk_insert_mappings(Artist, [{"name": f'Artist {i}', "city": 'City', "state": 1} for i in (1, 2)])
+        db.session.commit()
+
+    @classmethod
+    def tearDownClass(cls):
+        db.session.remove()
+        db.drop_all()
+        cls.ctx.pop()
+
+    def setUp(self):
+        self.client = app.test_client()
+
+    def tearDown(self):
+        db.session.rollback()
+
+    def test_utc(self):
+        """UTC timestamps, as in the sample data, are stored as naive local time"""
+        start = datetime(2035, 4, 1, 20, 0, tzinfo=timezone.utc)
+        response = self.client.post('/shows/bulk', json={"shows": [
+            {"artist_id": 1, "venue_id": 1, "start_time": '2035-04-01T20:00:00.000Z'},
+            {"artist_id": 2, "venue_id": 2, "start_time": '2035-04-02T20:00:00'},
+        ]})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json['created'], 2)
+        self.assertEqual(db.session.query(Show.start_time).filter(Show.venue_id == 1).scalar(),
+                         start.astimezone().replace(tzinfo=None))
+        self.assertEqual(db.session.query(Show.start_time).filter(Show.venue_id == 2).scalar(),
+                         datetime(2035, 4, 2, 20, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import unittest
+from datetime import datetime, timedelta
+
+from app import app, db, Venue, Artist, Show, Genre, State
+import reference_data
+
+
+class ShowsListingTestCase(unittest.TestCase):
+    """/shows lists every show, streamed unless a flash is pending"""
+
+    @classmethod
+    def setUpClass(cls):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['TESTING'] = True
+        app.config['PAGE_CACHE'] = False
+        cls.ctx = app.app_context()
+        cls.ctx.push()
+        db.drop_all()
+        db.create_all()
+        db.session.bulk_insert_mappings(Genre, [{"name": name} for name in reference_data.GENRES])
+        db.session.bulk_insert_mappings(State, [{"name": name} for name in reference_data.STATES])
+        db.session.bulk_insert_mappings(Venue, [{"name": 'Listed Venue', "city": 'City', "state": 1}])
+        db.session.bulk_insert_mappings(Artist, [{"name": 'Listed Artist', "city": 'City', "state": 1}])
+        db.session.bulk_insert_mappings(Show, [
+            {"venue_id": 1, "artist_id": 1, "start_time": datetime.now() + timedelta(days=days)} for days in (-3, 3)])
+        db.session.commit()
+
+    @classmethod
+    def tearDownClass(cls):
+        db.session.remove()
+        db.drop_all()
+        cls.ctx.pop()
+
+    def setUp(self):
+        self.client = app.test_client()
+
+    def tearDown(self):
+        db.session.rollback()
+
+    def test_listing(self):
+        response = self.client.get('/shows')
+        self.assertEqual(response.get_data(as_text=True).count('Listed Artist'), 2)
+        response.close()
+
+    def test_listing_flash(self):
+        """A pending flash is shown on /shows once and then cleared"""
+        with self.client.session_transaction() as session:
+            session['_flashes'] = [('message', 'Show listing flash')]
+        self.assertIn(b'Show listing flash', self.client.get('/shows').get_data())
+        self.assertNotIn(b'Show listing flash', self.client.get('/').get_data())
+
+
+if __name__ == "__main__":
+    unittest.main()
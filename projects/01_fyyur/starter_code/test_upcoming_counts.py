@@ -0,0 +1,128 @@
+import unittest
+from datetime import datetime, timedelta
+
+from app import (app, db, Venue, Artist, Show, Genre, State, remove_owner,
+                 reconcile_upcoming_counts, upcoming_count_mismatches)
+import reference_data
+
+
+class UpcomingCountsTestCase(unittest.TestCase):
+    """Venue/Artist.upcoming_shows_count follows every kind of Show write"""
+
+    @classmethod
+    def setUpClass(cls):
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        app.config['TESTING'] = True
+        app.config['PAGE_CACHE'] = False
+        cls.ctx = app.app_context()
+        cls.ctx.push()
+
+    @classmethod
+    def tearDownClass(cls):
+        db.session.remove()
+        db.drop_all()
+        cls.ctx.pop()
+
+    def setUp(self):
+        db.session.remove()
+        db.drop_all()
+        db.create_all()
+        db.session.bulk_insert_mappings(Genre, [{"name": name} for name in reference_data.GENRES])
+        db.session.bulk_insert_mappings(State, [{"name": name} for name in reference_data.STATES])
+        db.session.bulk_insert_mappings(Venue, [{"name": f'Venue {i}', "city": 'City', "state": 1} for i in (1, 2)])
+        db.session.bulk_insert_mappings(Artist, [{"name": f'Artist {i}', "city": 'City', "state": 1} for i in (1, 2)])
+        db.session.commit()
+        self.now = datetime.now()
+        self.client = app.test_client()
+
+    def tearDown(self):
+        db.session.rollback()
+
+    def counts(self):
+        return {
+            "venues": dict(db.session.query(Venue.id, Venue.upcoming_shows_count)),
+            "artists": dict(db.session.query(Artist.id, Artist.upcoming_shows_count)),
+        }
+
+    def assertCounts(self, venues, artists):
+        self.assertEqual(self.counts(), {"venues": venues, "artists": artists})
+        self.assertEqual(upcoming_count_mismatches(), [])
+
+    def add_show(self, venue_id, artist_id, days):
+        show = Show(venue_id=venue_id, artist_id=artist_id, start_time=self.now + timedelta(days=days))
+        db.session.add(show)
+        db.session.commit()
+        return show
+
+    def test_orm_insert(self):
+        """Only upcoming shows are counted"""
+        self.add_show(1, 1, 3)
+        self.add_show(1, 2, -3)
+        self.assertCounts({1: 1, 2: 0}, {1: 1, 2: 0})
+
+    def test_orm_delete(self):
+        show = self.add_show(1, 1, 3)
+        db.session.delete(show)
+        db.session.commit()
+        self.assertCounts({1: 0, 2: 0}, {1: 0, 2: 0})
+
+    def test_orm_update(self):
+        """Moving a show to another venue or into the past moves its count"""
+        show = self.add_show(1, 1, 3)
+        show.venue_id = 2
+        db.session.commit()
+        self.assertCounts({1: 0, 2: 1}, {1: 1, 2: 0})
+        show.artist_id, show.start_time = 2, self.now - timedelta(days=1)
+        db.session.commit()
+        self.assertCounts({1: 0, 2: 0}, {1: 0, 2: 0})
+        show.start_time = self.now + timedelta(days=1)
+        db.session.commit()
+        self.assertCounts({1: 0, 2: 1}, {1: 0, 2: 1})
+
+    def test_bulk_schedule(self):
+        """/shows/bulk inserts with bulk_insert_mappings and updates the counters itself"""
+        start = self.now + timedelta(days=10)
+        response = self.client.post('/shows/bulk', json={"shows": [
+            {"artist_id": 1, "venue_id": 1, "start_time": start.isoformat(), "rrule": 'FREQ=WEEKLY;COUNT=3'},
+            {"artist_id": 2, "venue_id": 1, "start_time": (start - timedelta(days=20)).isoformat()},
+        ]})
+        self.assertEqual(response.json['created'], 4)
+        self.assertCounts({1: 3, 2: 0}, {1: 3, 2: 0})
+
+    def test_remove_owner(self):
+        """Deleting or archiving a venue takes its upcoming shows off its artists"""
+        self.add_show(1, 1, 3)
+        self.add_show(1, 2, 4)
+        self.add_show(2, 2, 5)
+        self.add_show(1, 2, -5)
+        self.assertTrue(remove_owner(Venue, 1, archive=True))
+        self.assertCounts({1: 0, 2: 1}, {1: 0, 2: 1})
+        self.assertEqual(db.session.query(Show).filter(Show.venue_id == 1).count(), 1)
+        self.assertTrue(remove_owner(Venue, 1))
+        self.assertCounts({2: 1}, {1: 0, 2: 1})
+        self.assertTrue(remove_owner(Artist, 2))
+        self.assertCounts({2: 0}, {1: 0})
+
+    def test_reconcile(self):
+        """Shows that start, and writes that skip the counters, are reconciled"""
+        self.add_show(1, 1, 1)
+        self.add_show(2, 2, 3)
+        # written around the counter maintenance
+        db.session.bulk_insert_mappings(Show, [{"venue_id": 2, "artist_id": 1, "start_time": self.now + timedelta(days=2)}])
+        db.session.commit()
+        runner = app.test_cli_runner()
+        result = runner.invoke(args=['check-show-counts'])
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn('Venue 2: stored 1, actual 2', result.output)
+        self.assertEqual(runner.invoke(args=['reconcile-show-counts']).exit_code, 0)
+        self.assertEqual(runner.invoke(args=['check-show-counts']).exit_code, 0)
+        self.assertCounts({1: 1, 2: 2}, {1: 2, 2: 1})
+        # a day and a half later the first show has started
+        later = self.now + timedelta(days=1, hours=12)
+        self.assertEqual(reconcile_upcoming_counts(since=self.now, now=later), 2)
+        self.assertEqual(upcoming_count_mismatches(now=later), [])
+        self.assertEqual(self.counts(), {"venues": {1: 0, 2: 2}, "artists": {1: 1, 2: 1}})
+
+
+if __name__ == "__main__":
+    unittest.main()